@@ -3,13 +3,15 @@ import json
 import os
 import random
 import time
-from datetime import datetime
+from collections import deque
+from datetime import datetime, timedelta
 from pathlib import Path
 from dataclasses import asdict
 from typing import List, Optional
 
 from fastapi import FastAPI, WebSocket, HTTPException, Query, Path as PathParam, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 
 # local imports
@@ -29,10 +31,26 @@ system_logger = get_system_logger()
 # Import pentest router
 from pentest.api import router as pentest_router
 
+# Evaluation phases pull in plotting libraries (matplotlib/seaborn) that are not
+# part of the serving requirements; keep the service usable without them.
+try:
+    from evaluation.phase1_dataset_evaluation import Phase1DatasetEvaluator
+    from evaluation.phase2_scenario_evaluation import Phase2ScenarioEvaluator
+except ImportError as e:
+    system_logger.warning(f"Evaluation endpoints unavailable: {e}")
+    Phase1DatasetEvaluator = None
+    Phase2ScenarioEvaluator = None
+
 # ---------------------------------------------------------------------
 # App setup
 # ---------------------------------------------------------------------
-app = FastAPI(title="Aegis IDS Mock Service", version="0.2.0")
+# ORJSONResponse serializes numpy scalars/arrays natively and is much faster than
+# the stdlib json encoder on the dict-heavy detection/metrics payloads.
+app = FastAPI(
+    title="Aegis IDS Mock Service",
+    version="0.2.0",
+    default_response_class=ORJSONResponse,
+)
 
 # Include routers
 app.include_router(pentest_router)
@@ -100,6 +118,10 @@ async def log_requests(request: Request, call_next):
 
 @app.on_event("startup")
 async def load_mock_and_models():
+    # Production launchers run with --loop uvloop --http httptools; surface the
+    # active loop so a fallback to the stdlib selector loop is visible in logs
+    loop_type = type(asyncio.get_running_loop())
+    system_logger.info(f"[Startup] Event loop: {loop_type.__module__}.{loop_type.__name__}")
     system_logger.info("[Startup] Loading detection models...")
     print("[Startup] Loading detection models...")
     models.load_models()
@@ -130,9 +152,28 @@ LIVE_MODE = MODE == "live"
 # Load static alerts (used in static mode)
 ALERTS: List[dict] = load_alert_seed() or []
 
+
+def _static_frame_prefix(alert: dict) -> str:
+    """Serialize an alert without its timestamp, leaving the JSON object open."""
+    fields = {k: v for k, v in alert.items() if k != "timestamp"}
+    body = json.dumps(fields)[:-1]
+    return body + ", " if fields else body
+
+
+# Static replay frames are serialized once and shared by every /ws/alerts client;
+# only the per-send timestamp is appended, so ALERTS itself is never mutated.
+STATIC_ALERT_FRAME_PREFIXES: List[str] = [_static_frame_prefix(a) for a in ALERTS]
+
 # Live alerts file
 LIVE_ALERTS_FILE = "live_alerts.json"
 
+# WebSocket send pacing: base delay plus random jitter (seconds)
+WS_DETECTION_MIN_DELAY, WS_DETECTION_JITTER = 0.5, 1.5
+WS_DEMO_MIN_DELAY, WS_DEMO_JITTER = 1.0, 1.5
+
+# Number of detections generated per refill of the /ws/detection/live buffer
+WS_DETECTION_BATCH_SIZE = 32
+
 
 # ---------------------------------------------------------------------
 # Routes
@@ -192,7 +233,8 @@ def get_alerts():
                     recent_lines = lines[-50:] if len(lines) > 50 else lines
                     alerts = [json.loads(line.strip()) for line in recent_lines if line.strip()]
                     return alerts
-            except:
+            except (OSError, ValueError) as e:
+                error_logger.warning(f"Failed to read live alerts file: {e}")
                 return []
         return []
     return ALERTS
@@ -280,8 +322,6 @@ METRICS_CACHE_TTL = 60  # seconds
 @app.get("/api/metrics/overview")
 async def get_metrics_overview():
     """Get comprehensive metrics overview from detection service - FAST with caching."""
-    import time
-    
     # Check cache first
     current_time = time.time()
     if _metrics_cache["data"] and (current_time - _metrics_cache["timestamp"]) < METRICS_CACHE_TTL:
@@ -309,7 +349,6 @@ async def get_metrics_overview():
     
     total_attacks = sum(1 for d in detections if d.get('label') == 'ATTACK')
     
-    from datetime import datetime, timedelta
     now = datetime.now()
     time_ago = now - timedelta(minutes=5)
     
@@ -371,9 +410,6 @@ async def get_system_status():
 async def get_explainability(detection_id: str):
     """Get SHAP explainability for a detection."""
     try:
-        import json
-        from pathlib import Path
-        
         # Determine attack type from detection ID
         detection_id_lower = detection_id.lower()
         attack_type = None
@@ -494,17 +530,27 @@ async def ws_live_detection(websocket: WebSocket):
     """
     await websocket.accept()
     
+    # Detections refilled in batches so the per-call overhead of
+    # generate_detections is amortized across many sent frames
+    pending: deque = deque()
+    
     try:
         while True:
-            # Generate a single detection (randomly choose attack type)
-            detections = detection_service.generate_detections(num_flows=1)
+            if not pending:
+                # Generate off the event loop so other connections keep flowing
+                detections = await asyncio.to_thread(
+                    detection_service.generate_detections, WS_DETECTION_BATCH_SIZE
+                )
+                pending.extend(detections)
             
-            if detections:
-                detection = detections[0]
+            if pending:
+                # Buffered detections carry their generation time; stamp the send time
+                detection = pending.popleft()
+                detection["timestamp"] = datetime.now().isoformat()
                 await websocket.send_text(json.dumps(detection))
             
             # Wait before next detection (adjustable rate)
-            await asyncio.sleep(random.uniform(0.5, 2.0))
+            await asyncio.sleep(WS_DETECTION_MIN_DELAY + random.random() * WS_DETECTION_JITTER)
     except Exception as e:
         print(f"WebSocket error: {e}")
         await websocket.close()
@@ -535,8 +581,10 @@ async def ws_alerts(websocket: WebSocket):
                             if line.strip():
                                 alert = json.loads(line.strip())
                                 await websocket.send_text(json.dumps(alert))
-                except:
-                    pass
+                except (OSError, ValueError) as e:
+                    # json.JSONDecodeError is a ValueError; anything else (including
+                    # cancellation and client disconnects) propagates
+                    error_logger.warning(f"Live alert tail failed: {e}")
             await asyncio.sleep(0.5)
 
     # --- DEMO MODE ---
@@ -544,16 +592,16 @@ async def ws_alerts(websocket: WebSocket):
         while True:
             alert = random_flow()
             await websocket.send_text(json.dumps(alert))
-            await asyncio.sleep(random.uniform(1.0, 2.5))
+            await asyncio.sleep(WS_DEMO_MIN_DELAY + random.random() * WS_DEMO_JITTER)
 
     # --- STATIC MODE ---
     else:
         if not ALERTS:
             await websocket.send_text(json.dumps({"info": "no alerts found"}))
         else:
-            for alert in ALERTS:
-                alert["timestamp"] = datetime.utcnow().isoformat() + "Z"
-                await websocket.send_text(json.dumps(alert))
+            for prefix in STATIC_ALERT_FRAME_PREFIXES:
+                timestamp = datetime.utcnow().isoformat() + "Z"
+                await websocket.send_text(f'{prefix}"timestamp": "{timestamp}"}}')
                 await asyncio.sleep(1.5)
         await websocket.close()
 
@@ -569,9 +617,10 @@ async def run_phase1_evaluation(
     Phase 1: Dataset-Level Evaluation
     Returns classic ML metrics (accuracy, precision, recall, F1, confusion matrix, ROC-AUC)
     """
+    if Phase1DatasetEvaluator is None:
+        raise HTTPException(status_code=503, detail="Phase 1 evaluation dependencies are not installed")
+    
     try:
-        from evaluation.phase1_dataset_evaluation import Phase1DatasetEvaluator
-        
         # Map attack type to paths
         model_paths = {
             "Syn": ("artifacts/Syn/xgb_baseline.joblib", "datasets/processed/Syn/test.parquet"),
@@ -612,9 +661,10 @@ async def run_phase2_evaluation(
     Phase 2: Scenario-Based Evaluation
     Tests model behavior with realistic traffic sequences over time
     """
+    if Phase2ScenarioEvaluator is None:
+        raise HTTPException(status_code=503, detail="Phase 2 evaluation dependencies are not installed")
+    
     try:
-        from evaluation.phase2_scenario_evaluation import Phase2ScenarioEvaluator
-        
         model_paths = {
             "Syn": ("artifacts/Syn/xgb_baseline.joblib", "datasets/processed/Syn/test.parquet"),
             "mitm_arp": ("artifacts/mitm_arp/xgb_baseline.joblib", "datasets/processed/mitm_arp/test.parquet"),
@@ -4,14 +4,20 @@ Loads ML models and generates live predictions from test datasets
 """
 
 import numpy as np
-import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 import joblib
 import warnings
+import os
 import time
 from pathlib import Path
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple
 import random
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from .logger_config import (
     get_detection_logger,
     get_alert_logger,
@@ -25,6 +31,13 @@ from ..engine.correlation import CorrelationEngine
 # Suppress sklearn feature name warnings
 warnings.filterwarnings('ignore', message='X has feature names')
 
+# Memory-mapped float32 feature matrices live in this folder next to each parquet file
+FEATURE_CACHE_DIRNAME = ".feature_cache"
+
+# Attack severity by confidence: > 0.95 critical, > 0.85 high, > 0.75 medium, else low
+SEVERITY_THRESHOLDS = np.array([0.75, 0.85, 0.95])
+SEVERITY_LEVELS = np.array(["low", "medium", "high", "critical"], dtype=object)
+
 
 class DetectionService:
     """Service for loading models and generating real-time detections."""
@@ -34,9 +47,25 @@ class DetectionService:
         self.datasets = {}
         self.detection_indices = {'Syn': 0, 'mitm_arp': 0, 'dns_exfiltration': 0}
         self.confusion_matrix = {'tp': 0, 'fp': 0, 'tn': 0, 'fn': 0}
-        self._prediction_cache = {}  # Pre-generated predictions cache
-        self._cache_size = 300  # Keep 300 predictions ready per model (increased from 200)
-        self._cache_refill_threshold = 100  # Refill when below 100 (increased from 50)
+        self._prediction_cache: Dict[str, deque] = {}  # Pre-generated predictions cache (FIFO per model)
+        # Refill batch size doubles as the inference batch: large enough for XGBoost
+        # to spread row scoring across all cores in a single call
+        self._cache_size = 1024  # Keep 1024 predictions ready per model (increased from 300)
+        self._cache_refill_threshold = 256  # Refill when below 256 (increased from 100)
+        
+        # Background refill: one worker thread, at most one pending refill per model.
+        # Each model's cache has its own lock so refills and pops for different
+        # attack types never contend; inference itself runs outside any lock.
+        self._refill_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cache-refill")
+        self._refill_inflight: Dict[str, bool] = {}
+        self._cache_locks: Dict[str, threading.Lock] = {}
+        
+        # Served detections are logged on their own thread so log I/O stays off
+        # the request path; a single worker keeps log order equal to serve order
+        self._log_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="detection-log")
+        
+        # Per-thread reusable argmax/max output buffers for batch scoring
+        self._batch_buffers = threading.local()
         
         # Initialize loggers
         self.detection_logger = get_detection_logger()
@@ -62,7 +91,8 @@ class DetectionService:
                     'model': syn_dict['model'],
                     'label_encoder': syn_dict['label_encoder'],
                     'classes': syn_dict['label_encoder'].classes_.tolist(),
-                    'type': 'xgboost'
+                    'type': 'xgboost',
+                    **self._booster_info(syn_dict['model'])
                 }
                 print(f"âœ… Loaded SYN model: {len(self.models['Syn']['classes'])} classes")
                 self.system_logger.info(f"Loaded SYN model with {len(self.models['Syn']['classes'])} classes from {syn_path}")
@@ -78,7 +108,8 @@ class DetectionService:
                     'model': mitm_dict['model'],
                     'label_encoder': mitm_dict['label_encoder'],
                     'classes': mitm_dict['label_encoder'].classes_.tolist(),
-                    'type': 'xgboost'
+                    'type': 'xgboost',
+                    **self._booster_info(mitm_dict['model'])
                 }
                 print(f"âœ… Loaded MITM model: {len(self.models['mitm_arp']['classes'])} classes")
                 self.system_logger.info(f"Loaded MITM model with {len(self.models['mitm_arp']['classes'])} classes from {mitm_path}")
@@ -102,6 +133,14 @@ class DetectionService:
             else:
                 self.system_logger.warning(f"DNS model not found at {dns_path}")
             
+            # Class names and benign flags indexed by encoded class id, so a whole
+            # batch of predictions is labelled/classified with one fancy index
+            for model_dict in self.models.values():
+                model_dict['classes_arr'] = np.asarray(model_dict['classes'], dtype=object)
+                model_dict['benign_mask'] = np.array(
+                    ['benign' in str(c).lower() for c in model_dict['classes']], dtype=bool
+                )
+            
             load_time = time.time() - start_time
             log_with_extra(
                 self.performance_logger,
@@ -128,42 +167,32 @@ class DetectionService:
             # Load SYN test data
             syn_path = base_path / "Syn" / "test.parquet"
             if syn_path.exists():
-                df_syn = pd.read_parquet(syn_path)
-                self.datasets['Syn'] = {
-                    'X_test': df_syn.drop('label', axis=1),
-                    'y_test': df_syn['label']
-                }
-                print(f"âœ… Loaded SYN dataset: {len(df_syn)} samples")
-                self.system_logger.info(f"Loaded SYN dataset: {len(df_syn)} samples")
-                datasets_loaded.append(('SYN', len(df_syn)))
+                self.datasets['Syn'] = self._load_test_split('Syn', syn_path)
+                n_syn = len(self.datasets['Syn']['X_test'])
+                print(f"âœ… Loaded SYN dataset: {n_syn} samples")
+                self.system_logger.info(f"Loaded SYN dataset: {n_syn} samples")
+                datasets_loaded.append(('SYN', n_syn))
             
             # Load MITM test data
             mitm_path = base_path / "mitm_arp" / "test.parquet"
             if mitm_path.exists():
-                df_mitm = pd.read_parquet(mitm_path)
-                self.datasets['mitm_arp'] = {
-                    'X_test': df_mitm.drop('label', axis=1),
-                    'y_test': df_mitm['label']
-                }
-                print(f"âœ… Loaded MITM dataset: {len(df_mitm)} samples")
-                self.system_logger.info(f"Loaded MITM dataset: {len(df_mitm)} samples")
-                datasets_loaded.append(('MITM', len(df_mitm)))
+                self.datasets['mitm_arp'] = self._load_test_split('mitm_arp', mitm_path)
+                n_mitm = len(self.datasets['mitm_arp']['X_test'])
+                print(f"âœ… Loaded MITM dataset: {n_mitm} samples")
+                self.system_logger.info(f"Loaded MITM dataset: {n_mitm} samples")
+                datasets_loaded.append(('MITM', n_mitm))
             
             # Load DNS test data
             dns_path = base_path / "baseline_ml_stateful" / "processed_data.parquet"
             if dns_path.exists():
-                df_dns = pd.read_parquet(dns_path)
-                print(f"âœ… Loaded DNS dataset: {len(df_dns)} samples")
                 # Use last 20% as test data for simulation
-                test_size = int(len(df_dns) * 0.2)
-                df_dns_test = df_dns.tail(test_size).reset_index(drop=True)
-                self.datasets['dns_exfiltration'] = {
-                    'X_test': df_dns_test.drop('label', axis=1),
-                    'y_test': df_dns_test['label']
-                }
-                print(f"âœ… Loaded DNS dataset: {len(df_dns_test)} samples")
-                self.system_logger.info(f"Loaded DNS dataset: {len(df_dns_test)} samples")
-                datasets_loaded.append(('DNS', len(df_dns_test)))
+                self.datasets['dns_exfiltration'] = self._load_test_split(
+                    'dns_exfiltration', dns_path, test_fraction=0.2
+                )
+                n_dns = len(self.datasets['dns_exfiltration']['X_test'])
+                print(f"âœ… Loaded DNS dataset: {n_dns} samples")
+                self.system_logger.info(f"Loaded DNS dataset: {n_dns} samples")
+                datasets_loaded.append(('DNS', n_dns))
             
             load_time = time.time() - start_time
             log_with_extra(
@@ -181,6 +210,87 @@ class DetectionService:
             self.error_logger.error(f"Error loading datasets: {str(e)}", exc_info=True)
             raise
     
+    @staticmethod
+    def _booster_info(model) -> Dict:
+        """Capture the raw XGBoost booster so inference can skip DMatrix construction."""
+        if not hasattr(model, 'get_booster'):
+            return {}
+        # Match XGBClassifier.predict_proba, which stops at the early-stopping best iteration
+        iteration_range = (0, model.best_iteration + 1) if hasattr(model, 'best_iteration') else (0, 0)
+        booster = model.get_booster()
+        booster.set_param({'nthread': os.cpu_count() or 1})
+        return {'booster': booster, 'iteration_range': iteration_range}
+    
+    @staticmethod
+    def _predict_proba(model_dict: Dict, X: np.ndarray) -> np.ndarray:
+        """Class probabilities for a feature matrix, shape (n_samples, n_classes)."""
+        # Models score in float32 internally; this is a no-op for the cached
+        # test matrices and avoids a float64 copy for any other caller
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        booster = model_dict.get('booster')
+        if booster is None:
+            return model_dict['model'].predict_proba(X)
+        
+        # inplace_predict scores straight from the numpy buffer (no DMatrix copy)
+        proba = booster.inplace_predict(X, iteration_range=model_dict['iteration_range'])
+        if proba.ndim == 1:
+            # binary:logistic only returns P(class 1)
+            proba = np.column_stack((1.0 - proba, proba))
+        return proba
+    
+    @staticmethod
+    def _feature_matrix(table: pa.Table) -> np.ndarray:
+        """Contiguous float32 feature matrix for every non-label column of a table."""
+        feature_cols = [c for c in table.column_names if c != 'label']
+        # Cast each Arrow column straight into a preallocated float32 matrix,
+        # skipping the float64 pandas DataFrame round-trip
+        X = np.empty((table.num_rows, len(feature_cols)), dtype=np.float32)
+        for j, col in enumerate(feature_cols):
+            X[:, j] = table.column(col).to_numpy()
+        return X
+    
+    def _load_test_split(self, name: str, parquet_path: Path, test_fraction: Optional[float] = None) -> Dict:
+        """
+        Load a test split with its feature matrix memory-mapped from disk.
+        
+        The float32 features are written once to a .npy file next to the parquet
+        source (rebuilt whenever the parquet is newer) and opened with
+        mmap_mode='r', so only the pages of rows actually scored stay resident.
+        Labels are small and kept in memory.
+        
+        Args:
+            name: Dataset key, used for the cache file name
+            parquet_path: Source parquet file
+            test_fraction: If set, use only this trailing fraction of the rows
+        """
+        labels = pq.read_table(parquet_path, columns=['label'])
+        start = len(labels) - int(len(labels) * test_fraction) if test_fraction else 0
+        y = labels.slice(start).column('label')
+        split = {
+            'y_test': y.to_numpy(),
+            # Ground-truth benign flag per row, computed once instead of a
+            # lowercase/substring test on every prediction
+            'y_benign': pc.match_substring(
+                pc.utf8_lower(pc.cast(y, pa.string())), 'benign'
+            ).fill_null(False).to_numpy(zero_copy_only=False)
+        }
+        
+        cache_dir = parquet_path.parent / FEATURE_CACHE_DIRNAME
+        cache_file = cache_dir / f"{name}_X.npy"
+        if not cache_file.exists() or cache_file.stat().st_mtime < parquet_path.stat().st_mtime:
+            X = self._feature_matrix(pq.read_table(parquet_path).slice(start))
+            try:
+                cache_dir.mkdir(parents=True, exist_ok=True)
+                tmp_file = cache_dir / f"{name}_X.tmp.npy"
+                np.save(tmp_file, X)
+                tmp_file.replace(cache_file)
+            except OSError as e:
+                # Read-only dataset directory: keep the in-memory matrix
+                self.system_logger.warning(f"Could not write feature cache for {name}: {e}")
+                return {'X_test': X, **split}
+        
+        return {'X_test': np.load(cache_file, mmap_mode='r'), **split}
+    
     def predict_single(self, attack_type: str) -> Optional[Dict]:
         """Make a single prediction from the test dataset."""
         if attack_type not in self.models or attack_type not in self.datasets:
@@ -193,24 +303,22 @@ class DetectionService:
             dataset = self.datasets[attack_type]
         
             # Get next sample
-            idx = self.detection_indices[attack_type] % len(dataset['X_test'])
-            self.detection_indices[attack_type] += 1
+            with self._cache_lock(attack_type):
+                idx = self.detection_indices[attack_type] % len(dataset['X_test'])
+                self.detection_indices[attack_type] += 1
             
-            flow = dataset['X_test'].iloc[idx:idx+1]
-            true_label = dataset['y_test'].iloc[idx]
+            flow_array = dataset['X_test'][idx:idx+1]
+            true_label = dataset['y_test'][idx]
             
             # Make prediction
-            model = model_dict['model']
-            # Convert to numpy array to avoid sklearn feature name warnings
-            flow_array = flow.values if hasattr(flow, 'values') else flow
-            prediction = model.predict(flow_array)[0]
-            probabilities = model.predict_proba(flow_array)[0]
-            pred_label = model_dict['classes'][int(prediction)]
-            confidence = float(max(probabilities))
-            
-            # Determine if benign
-            is_benign_true = 'benign' in str(true_label).lower()
-            is_benign_pred = 'benign' in str(pred_label).lower()
+            probabilities = self._predict_proba(model_dict, flow_array)[0]
+            pred_id = int(probabilities.argmax())
+            pred_label = model_dict['classes'][pred_id]
+            confidence = float(probabilities.max())
+            
+            # Determine if benign (precomputed lookups)
+            is_benign_true = bool(dataset['y_benign'][idx])
+            is_benign_pred = bool(model_dict['benign_mask'][pred_id])
             
             # Update confusion matrix
             if not is_benign_pred and not is_benign_true:
@@ -252,9 +360,10 @@ class DetectionService:
                 proto = "TCP"
                 display_label = pred_label
             
+            now = datetime.now()
             result = {
-                "id": f"{attack_type}_{idx}_{int(datetime.now().timestamp())}",
-                "timestamp": datetime.now().isoformat(),
+                "id": f"{attack_type}_{idx}_{int(now.timestamp())}",
+                "timestamp": now.isoformat(),
                 "src_ip": src_ip,
                 "dst_ip": dst_ip,
                 "src_port": random.randint(1024, 65535),
@@ -326,63 +435,85 @@ class DetectionService:
             dataset = self.datasets[attack_type]
             predictions = []
         
-            # Get batch of samples
-            start_idx = self.detection_indices[attack_type]
+            # Reserve this batch's window of samples (wrapping around the end of
+            # the dataset) so concurrent refills never score the same rows
             dataset_size = len(dataset['X_test'])
+            with self._cache_lock(attack_type):
+                start_idx = self.detection_indices[attack_type]
+                self.detection_indices[attack_type] = (start_idx + batch_size) % dataset_size
+            idxs = (start_idx + np.arange(batch_size)) % dataset_size
+            
+            # Score the whole batch with a single model call; the predicted class
+            # is the argmax of the probabilities, so no separate predict() is needed
+            flow_array = dataset['X_test'][idxs]
+            probabilities = self._predict_proba(model_dict, flow_array)
+            pred_ids, confidences = self._output_buffers(attack_type, batch_size)
+            np.argmax(probabilities, axis=1, out=pred_ids)
+            np.max(probabilities, axis=1, out=confidences)
+            
+            # Benign/attack and severity for the whole batch; benign rows are always "low"
+            benign_flags = model_dict['benign_mask'][pred_ids]
+            severity_idx = np.digitize(confidences, SEVERITY_THRESHOLDS, right=True)
+            severity_idx[benign_flags] = 0
+            severities = SEVERITY_LEVELS[severity_idx].tolist()
+            benign_flags = benign_flags.tolist()
+            
+            # Draw all synthetic addressing for the batch up front (high bound is
+            # exclusive for numpy, so +1 keeps the previous inclusive ranges)
+            octets = np.random.randint(1, 255, size=(batch_size, 4))
+            if attack_type == "dns_exfiltration":
+                octets[:, 2] = np.random.randint(1, 9, size=batch_size)
+            octets = octets.tolist()
+            src_ports = np.random.randint(1024, 65536, size=batch_size).tolist()
+            if attack_type == "Syn":
+                dst_ports = np.random.randint(1, 1025, size=batch_size).tolist()
+            else:
+                dst_ports = np.random.randint(1024, 65536, size=batch_size).tolist()
+            
+            # One clock read per batch; rows share the timestamp and keep unique ids
+            batch_time = datetime.now()
+            timestamp = batch_time.isoformat()
+            epoch_seconds = int(batch_time.timestamp())
+            
+            # Bind everything the row loop touches to locals up front; tolist()
+            # hands back native ints/floats so no per-row int()/float() is needed
+            pred_labels = model_dict['classes_arr'][pred_ids].tolist()
+            row_idxs = idxs.tolist()
+            confidences = confidences.tolist()
+            append = predictions.append
             
             for i in range(batch_size):
-                idx = (start_idx + i) % dataset_size
-                flow = dataset['X_test'].iloc[idx:idx+1]
-                true_label = dataset['y_test'].iloc[idx]
-                
-                # Make prediction
-                model = model_dict['model']
-                flow_array = flow.values if hasattr(flow, 'values') else flow
-                prediction = model.predict(flow_array)[0]
-                probabilities = model.predict_proba(flow_array)[0]
-                pred_label = model_dict['classes'][int(prediction)]
-                confidence = float(max(probabilities))
-                
-                # Determine if benign
-                is_benign_pred = 'benign' in str(pred_label).lower()
-                
-                # Determine severity
-                if not is_benign_pred:
-                    if confidence > 0.95:
-                        severity = "critical"
-                    elif confidence > 0.85:
-                        severity = "high"
-                    elif confidence > 0.75:
-                        severity = "medium"
-                    else:
-                        severity = "low"
-                else:
-                    severity = "low"
+                idx = row_idxs[i]
+                pred_label = pred_labels[i]
+                confidence = confidences[i]
+                is_benign_pred = benign_flags[i]
+                severity = severities[i]
                 
                 # Generate IPs based on attack type
+                a, b, c, d = octets[i]
                 if attack_type == "mitm_arp":
-                    src_ip = f"192.168.1.{np.random.randint(1, 255)}"
-                    dst_ip = f"192.168.1.{np.random.randint(1, 255)}"
+                    src_ip = f"192.168.1.{a}"
+                    dst_ip = f"192.168.1.{b}"
                     proto = "ARP"
                     display_label = f"{pred_label} + Sniffing" if not is_benign_pred else pred_label
                 elif attack_type == "dns_exfiltration":
-                    src_ip = f"10.0.{np.random.randint(1, 255)}.{np.random.randint(1, 255)}"
-                    dst_ip = f"8.8.{np.random.randint(1, 9)}.{np.random.randint(1, 255)}"
+                    src_ip = f"10.0.{a}.{b}"
+                    dst_ip = f"8.8.{c}.{d}"
                     proto = "DNS"
                     display_label = "DNS_Exfiltration" if not is_benign_pred else pred_label
                 else:  # SYN
-                    src_ip = f"192.168.{np.random.randint(1, 255)}.{np.random.randint(1, 255)}"
-                    dst_ip = f"10.0.{np.random.randint(1, 255)}.{np.random.randint(1, 255)}"
+                    src_ip = f"192.168.{a}.{b}"
+                    dst_ip = f"10.0.{c}.{d}"
                     proto = "TCP"
                     display_label = pred_label
                 
-                predictions.append({
-                    "id": f"{attack_type}_{idx}_{int(datetime.now().timestamp())}_{i}",
-                    "timestamp": datetime.now().isoformat(),
+                prediction = {
+                    "id": f"{attack_type}_{idx}_{epoch_seconds}_{i}",
+                    "timestamp": timestamp,
                     "src_ip": src_ip,
                     "dst_ip": dst_ip,
-                    "src_port": random.randint(1024, 65535),
-                    "dst_port": random.randint(1, 1024) if attack_type == "Syn" else random.randint(1024, 65535),
+                    "src_port": src_ports[i],
+                    "dst_port": dst_ports[i],
                     "protocol": proto,
                     "attack_type": display_label,
                     "severity": severity,
@@ -393,22 +524,25 @@ class DetectionService:
                     "source_ip": src_ip,
                     "destination_ip": dst_ip,
                     "model_type": attack_type
-                })
-            
-            self.detection_indices[attack_type] = (start_idx + batch_size) % dataset_size
+                }
+                
+                # Correlation enrichment reads live scan results, so it runs when
+                # the detection is served (generate_detections), not here
+                append(prediction)
             
             # Log batch generation performance
-            generation_time = time.time() - start_time
-            log_with_extra(
-                self.performance_logger,
-                20,  # INFO
-                f"Batch predictions generated for {attack_type}",
-                attack_type=attack_type,
-                batch_size=batch_size,
-                predictions_count=len(predictions),
-                generation_time_seconds=generation_time,
-                predictions_per_second=batch_size / generation_time if generation_time > 0 else 0
-            )
+            if self.performance_logger.isEnabledFor(20):
+                generation_time = time.time() - start_time
+                log_with_extra(
+                    self.performance_logger,
+                    20,  # INFO
+                    f"Batch predictions generated for {attack_type}",
+                    attack_type=attack_type,
+                    batch_size=batch_size,
+                    predictions_count=len(predictions),
+                    generation_time_seconds=generation_time,
+                    predictions_per_second=batch_size / generation_time if generation_time > 0 else 0
+                )
             
             return predictions
             
@@ -416,32 +550,86 @@ class DetectionService:
             self.error_logger.error(f"Error in batch prediction for {attack_type}: {str(e)}", exc_info=True)
             return []
     
+    def _output_buffers(self, attack_type: str, size: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Reusable (pred_ids, confidences) arrays of length ``size`` for one model.
+        
+        Buffers are thread-local because a synchronous refill and the background
+        refill may score the same model at the same time; they only grow when a
+        larger batch is requested.
+        """
+        buffers = getattr(self._batch_buffers, 'by_type', None)
+        if buffers is None:
+            buffers = self._batch_buffers.by_type = {}
+        
+        pred_ids, confidences = buffers.get(attack_type, (None, None))
+        if pred_ids is None or len(pred_ids) < size:
+            pred_ids = np.empty(size, dtype=np.intp)
+            confidences = np.empty(size, dtype=np.float64)
+            buffers[attack_type] = (pred_ids, confidences)
+        return pred_ids[:size], confidences[:size]
+    
     def _ensure_cache_filled(self):
-        """Ensure prediction cache is filled for all models."""
+        """
+        Ensure prediction cache is filled for all models.
+        
+        Empty caches are refilled synchronously (startup warmup, or a drained
+        cache that has nothing to serve). Caches that are only below the refill
+        threshold are topped up on the background refill thread, so requests
+        never wait on model inference while there is still something to serve.
+        """
         if not self.models:
             return
         
         for attack_type in self.models.keys():
-            if attack_type not in self._prediction_cache:
-                self._prediction_cache[attack_type] = []
-            
-            cache_size = len(self._prediction_cache[attack_type])
-            if cache_size < self._cache_refill_threshold:
-                # Refill cache
-                new_predictions = self._generate_batch_predictions(attack_type, self._cache_size)
-                self._prediction_cache[attack_type].extend(new_predictions)
-                
-                # Log cache refill
-                log_with_extra(
-                    self.system_logger,
-                    20,  # INFO
-                    f"Cache refilled for {attack_type}",
-                    attack_type=attack_type,
-                    new_predictions=len(new_predictions),
-                    total_cache_size=len(self._prediction_cache[attack_type]),
-                    refill_threshold=self._cache_refill_threshold
-                )
-                print(f"[Cache] Refilled {attack_type}: {len(new_predictions)} predictions")
+            cache = self._prediction_cache.setdefault(attack_type, deque())
+            if len(cache) >= self._cache_refill_threshold:
+                continue
+            
+            if not cache:
+                self._refill_cache(attack_type)
+                continue
+            
+            with self._cache_lock(attack_type):
+                if self._refill_inflight.get(attack_type):
+                    continue
+                self._refill_inflight[attack_type] = True
+            self._refill_executor.submit(self._background_refill, attack_type)
+    
+    def _cache_lock(self, attack_type: str) -> threading.Lock:
+        """Lock guarding one model's cache, refill flag and sample index."""
+        lock = self._cache_locks.get(attack_type)
+        if lock is None:
+            lock = self._cache_locks.setdefault(attack_type, threading.Lock())
+        return lock
+    
+    def _background_refill(self, attack_type: str):
+        """Refill worker run on the background executor."""
+        try:
+            self._refill_cache(attack_type)
+        except Exception as e:
+            self.error_logger.error(f"Background cache refill failed for {attack_type}: {str(e)}", exc_info=True)
+        finally:
+            with self._cache_lock(attack_type):
+                self._refill_inflight[attack_type] = False
+    
+    def _refill_cache(self, attack_type: str):
+        """Generate a batch of predictions and append it to the model's cache."""
+        new_predictions = self._generate_batch_predictions(attack_type, self._cache_size)
+        with self._cache_lock(attack_type):
+            self._prediction_cache[attack_type].extend(new_predictions)
+        
+        # Log cache refill
+        log_with_extra(
+            self.system_logger,
+            20,  # INFO
+            f"Cache refilled for {attack_type}",
+            attack_type=attack_type,
+            new_predictions=len(new_predictions),
+            total_cache_size=len(self._prediction_cache[attack_type]),
+            refill_threshold=self._cache_refill_threshold
+        )
+        print(f"[Cache] Refilled {attack_type}: {len(new_predictions)} predictions")
     
     def generate_detections(self, num_flows: int = 5, attack_types: Optional[List[str]] = None) -> List[Dict]:
         """Generate multiple detections FAST using pre-generated cache."""
@@ -456,61 +644,85 @@ class DetectionService:
         # Ensure cache is filled
         self._ensure_cache_filled()
         
+        # Sample the attack type of every requested flow in one call, then pop
+        # each type's share from its cache in a single locked run
+        picks = np.random.randint(len(attack_types), size=num_flows)
+        popped: Dict[str, deque] = {}
+        for type_idx, count in enumerate(np.bincount(picks, minlength=len(attack_types)).tolist()):
+            attack_type = attack_types[type_idx]
+            cache = self._prediction_cache.get(attack_type)
+            if not count or not cache:
+                continue
+            # Pop from cache (FIFO)
+            with self._cache_lock(attack_type):
+                run = [cache.popleft() for _ in range(min(count, len(cache)))]
+            popped.setdefault(attack_type, deque()).extend(run)
+        
+        # Hand detections back in the sampled order so attack types stay interleaved.
+        # Cached entries carry only the static fields; correlation against the
+        # latest scan results is applied now, as each one is served
+        enrich_alert = CorrelationEngine.enrich_alert
         detections = []
-        for _ in range(num_flows):
-            attack_type = random.choice(attack_types)
-            if attack_type in self._prediction_cache and self._prediction_cache[attack_type]:
-                # Pop from cache (FIFO)
-                detection = self._prediction_cache[attack_type].pop(0)
-                
-                # --- CORRELATION ENGINE ENRICHMENT ---
-                detection = CorrelationEngine.enrich_alert(detection)
-                # -------------------------------------
-                
-                detections.append(detection)
-                
-                # Only log attacks with high confidence (reduce logging overhead)
-                is_attack = detection.get('label') == 'ATTACK'
-                confidence = detection.get('confidence', detection.get('score', 0))
-                severity = detection.get('severity', 'low')
-                
-                # Log only important detections (attacks with confidence > 0.75)
-                if is_attack and confidence > 0.75:
-                    log_with_extra(
-                        self.detection_logger,
-                        20,  # INFO
-                        f"Detection: {detection.get('attack_type')} ({severity})",
-                        detection_id=detection.get('id'),
-                        attack_type=detection.get('attack_type'),
-                        confidence=confidence,
-                        severity=severity,
-                        src_ip=detection.get('src_ip'),
-                        dst_ip=detection.get('dst_ip'),
-                        protocol=detection.get('protocol'),
-                        model_type=detection.get('model_type')
-                    )
-                    
-                    # Log alert if attack detected with high confidence
-                    if confidence > 0.8:
-                        log_with_extra(
-                            self.alert_logger,
-                            30,  # WARNING
-                            f"ALERT: {detection.get('attack_type')} detected from {detection.get('src_ip')} to {detection.get('dst_ip')}",
-                            alert_id=detection.get('id'),
-                            attack_type=detection.get('attack_type'),
-                            severity=severity,
-                            confidence=confidence,
-                            src_ip=detection.get('src_ip'),
-                            dst_ip=detection.get('dst_ip'),
-                            protocol=detection.get('protocol'),
-                            action_taken="logged"
-                        )
+        for type_idx in picks.tolist():
+            run = popped.get(attack_types[type_idx])
+            if run:
+                detections.append(enrich_alert(run.popleft()))
+        
+        if detections:
+            self._log_executor.submit(self._log_served_detections, detections)
         
         # Trigger background refill if needed
         self._ensure_cache_filled()
         
         return detections
     
+    def _log_served_detections(self, detections: List[Dict]):
+        """Log the high-confidence attacks among served detections (runs on the log thread)."""
+        log_detections = self.detection_logger.isEnabledFor(20)
+        log_alerts = self.alert_logger.isEnabledFor(30)
+        if not (log_detections or log_alerts):
+            return
+        
+        for detection in detections:
+            is_attack = detection.get('label') == 'ATTACK'
+            confidence = detection.get('confidence', detection.get('score', 0))
+            severity = detection.get('severity', 'low')
+            
+            # Log only important detections (attacks with confidence > 0.75)
+            if not is_attack or confidence <= 0.75:
+                continue
+            
+            if log_detections:
+                log_with_extra(
+                    self.detection_logger,
+                    20,  # INFO
+                    f"Detection: {detection.get('attack_type')} ({severity})",
+                    detection_id=detection.get('id'),
+                    attack_type=detection.get('attack_type'),
+                    confidence=confidence,
+                    severity=severity,
+                    src_ip=detection.get('src_ip'),
+                    dst_ip=detection.get('dst_ip'),
+                    protocol=detection.get('protocol'),
+                    model_type=detection.get('model_type')
+                )
+            
+            # Log alert if attack detected with high confidence
+            if log_alerts and confidence > 0.8:
+                log_with_extra(
+                    self.alert_logger,
+                    30,  # WARNING
+                    f"ALERT: {detection.get('attack_type')} detected from {detection.get('src_ip')} to {detection.get('dst_ip')}",
+                    alert_id=detection.get('id'),
+                    attack_type=detection.get('attack_type'),
+                    severity=severity,
+                    confidence=confidence,
+                    src_ip=detection.get('src_ip'),
+                    dst_ip=detection.get('dst_ip'),
+                    protocol=detection.get('protocol'),
+                    action_taken="logged"
+                )
+    
     def get_metrics(self) -> Dict:
         """Calculate performance metrics from confusion matrix."""
         cm = self.confusion_matrix
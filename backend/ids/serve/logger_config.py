@@ -5,7 +5,7 @@ Provides structured logging with rotation for all components
 
 import logging
 import logging.handlers
-import json
+import orjson
 from pathlib import Path
 from datetime import datetime
 from typing import Any, Dict
@@ -14,12 +14,20 @@ from typing import Any, Dict
 LOGS_DIR = Path("../logs")
 LOGS_DIR.mkdir(parents=True, exist_ok=True)
 
+# Names of loggers already wired up by setup_logger (handlers are attached once)
+_CONFIGURED = set()
+
+# Naive UTC datetimes serialize with a trailing "Z"; numpy values from model
+# output serialize natively instead of raising
+_ORJSON_OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z | orjson.OPT_SERIALIZE_NUMPY
+
+
 class StructuredFormatter(logging.Formatter):
     """Custom formatter that outputs JSON-structured logs"""
     
     def format(self, record: logging.LogRecord) -> str:
         log_data = {
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": datetime.utcnow(),  # rendered as ISO-8601 "...Z" by orjson
             "level": record.levelname,
             "logger": record.name,
             "message": record.getMessage(),
@@ -36,7 +44,7 @@ class StructuredFormatter(logging.Formatter):
         if hasattr(record, 'extra_data'):
             log_data.update(record.extra_data)
         
-        return json.dumps(log_data)
+        return orjson.dumps(log_data, option=_ORJSON_OPTIONS).decode()
 
 
 class HumanReadableFormatter(logging.Formatter):
@@ -70,6 +78,9 @@ def setup_logger(
         Configured logger instance
     """
     logger = logging.getLogger(name)
+    if name in _CONFIGURED:
+        return logger
+    
     logger.setLevel(level)
     
     # Clear existing handlers
@@ -99,6 +110,7 @@ def setup_logger(
         console_handler.setFormatter(HumanReadableFormatter())
         logger.addHandler(console_handler)
     
+    _CONFIGURED.add(name)
     return logger
 
 
@@ -143,5 +155,7 @@ def log_with_extra(logger: logging.Logger, level: int, message: str, **kwargs):
         message: Log message
         **kwargs: Extra data to include in structured logs
     """
+    if not logger.isEnabledFor(level):
+        return
     extra = {'extra_data': kwargs}
     logger.log(level, message, extra=extra)
@@ -3,45 +3,70 @@ stream.py — Fake alert generator for Iteration 1 demo.
 Emits random alerts using the frozen schema and shap_example.json.
 """
 
-import asyncio, json, random, uuid
+import asyncio, random, uuid
+from collections import deque
 from datetime import datetime
 from pathlib import Path
+import numpy as np
+import orjson
 from ids.schemas import LABELS, FEATURES, Alert, FeatureContribution, Explainability
 
 ROOT = Path(__file__).resolve().parents[2]
 SEED = ROOT / "seed"
 SHAP_EXAMPLE = SEED / "shap_example.json"
 
+# Parsed once at import; every alert reuses the same explainability template
+try:
+    _SHAP_DATA = orjson.loads(SHAP_EXAMPLE.read_bytes()) if SHAP_EXAMPLE.exists() else {}
+except Exception:
+    _SHAP_DATA = {}
+
+# Random alert fields are pre-sampled in bulk with NumPy and consumed one row at a time
+SAMPLE_BUFFER_SIZE = 1024
+_rng = np.random.default_rng()
+_samples: deque = deque()
+
+
+def _refill_samples(n: int = SAMPLE_BUFFER_SIZE):
+    """Draw the random fields for n alerts at once."""
+    _samples.extend(zip(
+        _rng.choice(LABELS, size=n).tolist(),
+        _rng.uniform(0.7, 0.99, size=n).round(2).tolist(),
+        _rng.choice(["low", "medium", "high"], size=n).tolist(),
+        _rng.choice(FEATURES, size=(n, 3)).tolist(),
+        _rng.uniform(0.1, 0.5, size=(n, 3)).round(2).tolist(),
+        _rng.integers(2, 241, size=(n, 2)).tolist(),
+        _rng.integers(1024, 65001, size=n).tolist(),
+        _rng.choice([22, 80, 443], size=n).tolist(),
+        _rng.choice(["TCP", "UDP"], size=n).tolist(),
+    ))
+
+
 def generate_alert() -> dict:
     """Return a randomized fake alert conforming to Alert schema."""
-    try:
-        shap_data = json.load(open(SHAP_EXAMPLE)) if SHAP_EXAMPLE.exists() else {}
-    except Exception:
-        shap_data = {}
-
-    label = random.choice(LABELS)
-    score = round(random.uniform(0.7, 0.99), 2)
-    severity = random.choice(["low", "medium", "high"])
-    sample_id = str(uuid.uuid4())
+    shap_data = _SHAP_DATA
 
-    # select 3 random top features
-    top_feats = [
-        {"name": random.choice(FEATURES), "contrib": round(random.uniform(0.1, 0.5), 2)}
-        for _ in range(3)
-    ]
+    if not _samples:
+        _refill_samples()
+    label, score, severity, feat_names, contribs, (src_host, dst_host), src_port, dst_port, proto = _samples.popleft()
+    sample_id = str(uuid.uuid4())
 
     alert = Alert(
         id=f"aegis-{sample_id}",
         timestamp=datetime.utcnow(),
-        src_ip=f"10.0.0.{random.randint(2, 240)}",
-        dst_ip=f"10.0.0.{random.randint(2, 240)}",
-        src_port=random.randint(1024, 65000),
-        dst_port=random.choice([22, 80, 443]),
-        proto=random.choice(["TCP", "UDP"]),
+        src_ip=f"10.0.0.{src_host}",
+        dst_ip=f"10.0.0.{dst_host}",
+        src_port=src_port,
+        dst_port=dst_port,
+        proto=proto,
         label=label,
         score=score,
         severity=severity,
-        top_features=[FeatureContribution(**f) for f in top_feats],
+        # 3 random top features
+        top_features=[
+            FeatureContribution(name=name, contrib=contrib)
+            for name, contrib in zip(feat_names, contribs)
+        ],
         explainability=Explainability(
             method=shap_data.get("method", "shap_tree"),
             version=shap_data.get("version", "0.44.1"),
@@ -4,10 +4,13 @@ Produces randomized alerts once every second.
 """
 
 import json
-import random
+import socket
 import time
+from collections import deque
 from datetime import datetime
 
+import numpy as np
+
 LABELS = ["BENIGN", "DDoS_SYN", "DDoS_UDP", "BRUTE_FTP", "SCAN_PORT", "MITM_ARP"]
 SEVERITY_MAP = {
     "BENIGN": "low",
@@ -17,33 +20,73 @@ SEVERITY_MAP = {
     "SCAN_PORT": "medium",
     "MITM_ARP": "high",
 }
+PROTOCOLS = ["TCP", "UDP", "ICMP"]
+
+# Parallel arrays: one index draw selects both the label and its severity
+_LABELS_ARR = np.array(LABELS)
+_SEVERITY_ARR = np.array([SEVERITY_MAP[label] for label in LABELS])
+
+# Flows are drawn in batches from NumPy's generator and handed out one by one
+FLOW_BUFFER_SIZE = 1024
+_rng = np.random.default_rng()
+_flow_buffer: deque = deque()
+
+
+def _random_ips(n: int) -> list:
+    """Generate n random IPv4 addresses in one vectorized draw."""
+    octets = np.column_stack((
+        _rng.integers(10, 256, size=n, dtype=np.uint8),
+        _rng.integers(0, 256, size=(n, 2), dtype=np.uint8),
+        _rng.integers(1, 255, size=n, dtype=np.uint8),
+    ))
+    # Rows are already in network byte order; inet_ntoa formats each 4-byte slice
+    packed = octets.tobytes()
+    return [socket.inet_ntoa(packed[i:i + 4]) for i in range(0, 4 * n, 4)]
 
 
 def random_ip() -> str:
     """Generate a random IPv4 address."""
-    return (
-        f"{random.randint(10, 255)}."
-        f"{random.randint(0, 255)}."
-        f"{random.randint(0, 255)}."
-        f"{random.randint(1, 254)}"
-    )
+    return _random_ips(1)[0]
+
+
+def random_flows_batch(n: int) -> list:
+    """Generate n randomized network flow alerts with batched RNG draws."""
+    timestamp = datetime.utcnow().isoformat() + "Z"
+    ids = _rng.integers(10000, 100000, size=n).tolist()
+    src_ips = _random_ips(n)
+    dst_ips = _random_ips(n)
+    protos = _rng.choice(PROTOCOLS, size=n).tolist()
+    pkt_rates = _rng.uniform(0.5, 15.0, size=n).round(2).tolist()
+    byte_rates = _rng.uniform(200, 10000, size=n).round(2).tolist()
+    label_idx = _rng.integers(0, len(_LABELS_ARR), size=n)
+    labels = _LABELS_ARR[label_idx].tolist()
+    severities = _SEVERITY_ARR[label_idx].tolist()
+    scores = _rng.uniform(0.6, 0.99, size=n).round(2).tolist()
+    return [
+        {
+            "id": f"alert-{ids[i]}",
+            "timestamp": timestamp,
+            "src_ip": src_ips[i],
+            "dst_ip": dst_ips[i],
+            "proto": protos[i],
+            "pkt_rate": pkt_rates[i],
+            "byte_rate": byte_rates[i],
+            "label": labels[i],
+            "score": scores[i],
+            "severity": severities[i],
+        }
+        for i in range(n)
+    ]
 
 
 def random_flow() -> dict:
     """Generate a single randomized network flow alert."""
-    label = random.choice(LABELS)
-    return {
-        "id": f"alert-{random.randint(10000, 99999)}",
-        "timestamp": datetime.utcnow().isoformat() + "Z",
-        "src_ip": random_ip(),
-        "dst_ip": random_ip(),
-        "proto": random.choice(["TCP", "UDP", "ICMP"]),
-        "pkt_rate": round(random.uniform(0.5, 15.0), 2),
-        "byte_rate": round(random.uniform(200, 10000), 2),
-        "label": label,
-        "score": round(random.uniform(0.6, 0.99), 2),
-        "severity": SEVERITY_MAP[label],
-    }
+    if not _flow_buffer:
+        _flow_buffer.extend(random_flows_batch(FLOW_BUFFER_SIZE))
+    flow = _flow_buffer.popleft()
+    # Buffered flows are stamped when handed out, not when drawn
+    flow["timestamp"] = datetime.utcnow().isoformat() + "Z"
+    return flow
 
 
 if __name__ == "__main__":
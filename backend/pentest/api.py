@@ -71,7 +71,7 @@ def run_background_scan(scan_id: str, target: str, scan_type: str):
                         for v in vulns:
                             # Recalculate dynamic score based on current context
                             v.severity_score = RiskScorer.calculate(v)
-                            enriched_vulns.append(v.dict(exclude_none=True))
+                            enriched_vulns.append(v.to_dict(exclude_none=True))
                             
                         port["vulnerabilities"] = enriched_vulns
                         
@@ -3,24 +3,59 @@ Threat Intelligence API Endpoints
 FastAPI routes for threat intelligence dashboard.
 """
 
-from fastapi import APIRouter, Query, HTTPException, WebSocket, WebSocketDisconnect
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, Query, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, ORJSONResponse
 from datetime import datetime, timedelta
-from typing import List, Optional
+from typing import List, Optional, Set
 import json
 import asyncio
+import time
 import uuid
 
+import orjson
+from pydantic import ValidationError
+
 from .models import (
     ThreatIncident, ThreatActor, MITRETechnique, IPReputation,
     ThreatIntelResponse, SeverityLevel, AttackType
 )
-from .database import get_db
+from .database import ThreatIntelDB, get_db
 from .threat_generator import ThreatGenerator
 
-router = APIRouter(prefix="/api/threat-intel", tags=["threat-intelligence"])
+# orjson renders the large incident/dashboard payloads much faster than stdlib json
+router = APIRouter(
+    prefix="/api/threat-intel",
+    tags=["threat-intelligence"],
+    default_response_class=ORJSONResponse
+)
 threat_gen = ThreatGenerator()
-active_connections: List[WebSocket] = []
+active_connections: Set[WebSocket] = set()
+
+# Fields returned per incident by list endpoints; detail endpoints dump the full model
+INCIDENT_LIST_FIELDS = {
+    "id", "timestamp", "source_ip", "target_service",
+    "attack_type", "severity", "confidence"
+}
+
+
+async def get_db_dep() -> ThreatIntelDB:
+    """FastAPI dependency resolving the shared database (async: no threadpool hop)"""
+    return get_db()
+
+
+# Envelope timestamps are informational; reuse the formatted value for 10ms
+TIMESTAMP_CACHE_SECONDS = 0.01
+_timestamp_cache = (float("-inf"), "")
+
+
+def _now_iso_cached() -> str:
+    """Current UTC time in ISO format, recomputed at most every 10ms"""
+    global _timestamp_cache
+    tick = time.monotonic()
+    if tick - _timestamp_cache[0] >= TIMESTAMP_CACHE_SECONDS:
+        _timestamp_cache = (tick, datetime.utcnow().isoformat())
+    return _timestamp_cache[1]
 
 
 # ============================================================================
@@ -28,22 +63,19 @@ active_connections: List[WebSocket] = []
 # ============================================================================
 
 @router.get("/summary")
-async def get_threat_summary():
+async def get_threat_summary(db: ThreatIntelDB = Depends(get_db_dep)):
     """Get overall threat summary statistics"""
-    db = get_db()
     summary = db.get_summary()
     return {
         "status": "success",
         "data": summary.model_dump(),
-        "timestamp": datetime.utcnow().isoformat()
+        "timestamp": _now_iso_cached()
     }
 
 
 @router.get("/dashboard")
-async def get_dashboard_data():
+async def get_dashboard_data(db: ThreatIntelDB = Depends(get_db_dep)):
     """Get complete dashboard data (all threat intelligence)"""
-    db = get_db()
-    
     response = ThreatIntelResponse(
         summary=db.get_summary(),
         recent_incidents=db.get_recent_incidents(limit=50),
@@ -56,7 +88,7 @@ async def get_dashboard_data():
     return {
         "status": "success",
         "data": response.model_dump(mode='json'),
-        "timestamp": datetime.utcnow().isoformat()
+        "timestamp": _now_iso_cached()
     }
 
 
@@ -68,11 +100,10 @@ async def get_dashboard_data():
 async def get_incidents(
     limit: int = Query(50, ge=1, le=500),
     hours: int = Query(24, ge=1, le=720),
-    severity: Optional[SeverityLevel] = Query(None)
+    severity: Optional[SeverityLevel] = Query(None),
+    db: ThreatIntelDB = Depends(get_db_dep)
 ):
     """Get recent incidents with optional filtering"""
-    db = get_db()
-    
     incidents = db.get_recent_incidents(limit=limit, hours=hours)
     
     if severity:
@@ -80,16 +111,15 @@ async def get_incidents(
     
     return {
         "status": "success",
-        "data": [i.model_dump(mode='json') for i in incidents],
+        "data": [i.model_dump(mode='json', include=INCIDENT_LIST_FIELDS) for i in incidents],
         "count": len(incidents),
-        "timestamp": datetime.utcnow().isoformat()
+        "timestamp": _now_iso_cached()
     }
 
 
 @router.get("/incidents/{incident_id}")
-async def get_incident_details(incident_id: str):
+async def get_incident_details(incident_id: str, db: ThreatIntelDB = Depends(get_db_dep)):
     """Get detailed information about a specific incident"""
-    db = get_db()
     incident = db.get_incident(incident_id)
     
     if not incident:
@@ -101,8 +131,8 @@ async def get_incident_details(incident_id: str):
         actor = db.get_actor(incident.threat_actor)
     
     techniques = [
-        db.get_technique(t) for t in incident.mitre_techniques
-        if db.get_technique(t)
+        technique for t in incident.mitre_techniques
+        if (technique := db.get_technique(t)) is not None
     ]
     
     return {
@@ -112,15 +142,50 @@ async def get_incident_details(incident_id: str):
             "threat_actor": actor.model_dump(mode='json') if actor else None,
             "mitre_techniques": [t.model_dump(mode='json') for t in techniques]
         },
-        "timestamp": datetime.utcnow().isoformat()
+        "timestamp": _now_iso_cached()
     }
 
 
-@router.post("/incidents")
-async def create_incident(incident: ThreatIncident):
-    """Create a new threat incident (for testing/manual entry)"""
-    db = get_db()
+def _inline_defs(schema: dict) -> dict:
+    """Resolves a model schema's local $defs refs, so it can be embedded in a route's OpenAPI entry"""
+    defs = schema.pop("$defs", {})
     
+    def resolve(node):
+        if isinstance(node, dict):
+            ref = node.get("$ref", "")
+            if ref.startswith("#/$defs/"):
+                return resolve(defs[ref.rsplit("/", 1)[1]])
+            return {k: resolve(v) for k, v in node.items()}
+        if isinstance(node, list):
+            return [resolve(v) for v in node]
+        return node
+    
+    return resolve(schema)
+
+
+# Request schema published for POST /incidents, whose body is parsed by incident_body
+INCIDENT_REQUEST_BODY = {
+    "required": True,
+    "content": {"application/json": {"schema": _inline_defs(ThreatIncident.model_json_schema())}},
+}
+
+
+async def incident_body(request: Request) -> ThreatIncident:
+    """
+    Body dependency for POST /incidents: validates the raw bytes with
+    model_validate_json (single-pass JSON parse + validation). Errors keep
+    FastAPI's ("body", ...) locations.
+    """
+    try:
+        return ThreatIncident.model_validate_json(await request.body())
+    except ValidationError as e:
+        raise RequestValidationError([{**err, "loc": ("body", *err["loc"])} for err in e.errors()])
+
+
+@router.post("/incidents", openapi_extra={"requestBody": INCIDENT_REQUEST_BODY})
+async def create_incident(incident: ThreatIncident = Depends(incident_body),
+                          db: ThreatIntelDB = Depends(get_db_dep)):
+    """Create a new threat incident (for testing/manual entry)"""
     # Generate ID if not provided
     if not incident.id:
         incident.id = f"inc-{uuid.uuid4().hex[:8]}"
@@ -131,7 +196,7 @@ async def create_incident(incident: ThreatIncident):
         "status": "success",
         "data": incident.model_dump(mode='json'),
         "message": "Incident created successfully",
-        "timestamp": datetime.utcnow().isoformat()
+        "timestamp": _now_iso_cached()
     }
 
 
@@ -140,32 +205,27 @@ async def create_incident(incident: ThreatIncident):
 # ============================================================================
 
 @router.get("/attacks/distribution")
-async def get_attack_distribution():
+async def get_attack_distribution(db: ThreatIntelDB = Depends(get_db_dep)):
     """Get attack type distribution"""
-    db = get_db()
     distribution = db.get_attack_distribution()
     
     return {
         "status": "success",
         "data": [d.model_dump(mode='json') for d in distribution],
-        "timestamp": datetime.utcnow().isoformat()
+        "timestamp": _now_iso_cached()
     }
 
 
 @router.get("/attacks/by-type/{attack_type}")
-async def get_incidents_by_type(attack_type: AttackType):
+async def get_incidents_by_type(attack_type: AttackType, db: ThreatIntelDB = Depends(get_db_dep)):
     """Get incidents by attack type"""
-    db = get_db()
-    incidents = [
-        i for i in db.get_recent_incidents(limit=1000)
-        if i.attack_type == attack_type
-    ]
+    incidents = db.get_incidents_by_attack_type(attack_type, limit=1000)
     
     return {
         "status": "success",
-        "data": [i.model_dump(mode='json') for i in incidents],
+        "data": [i.model_dump(mode='json', include=INCIDENT_LIST_FIELDS) for i in incidents],
         "count": len(incidents),
-        "timestamp": datetime.utcnow().isoformat()
+        "timestamp": _now_iso_cached()
     }
 
 
@@ -174,33 +234,28 @@ async def get_incidents_by_type(attack_type: AttackType):
 # ============================================================================
 
 @router.get("/mitre/techniques")
-async def get_mitre_techniques():
+async def get_mitre_techniques(db: ThreatIntelDB = Depends(get_db_dep)):
     """Get all MITRE techniques used in recent incidents"""
-    db = get_db()
     techniques = db.get_mitre_techniques_used()
     
     return {
         "status": "success",
         "data": [t.model_dump(mode='json') for t in techniques],
         "count": len(techniques),
-        "timestamp": datetime.utcnow().isoformat()
+        "timestamp": _now_iso_cached()
     }
 
 
 @router.get("/mitre/techniques/{technique_id}")
-async def get_mitre_technique(technique_id: str):
+async def get_mitre_technique(technique_id: str, db: ThreatIntelDB = Depends(get_db_dep)):
     """Get detailed MITRE technique information"""
-    db = get_db()
     technique = db.get_technique(technique_id)
     
     if not technique:
         raise HTTPException(status_code=404, detail="Technique not found")
     
     # Get incidents using this technique
-    incidents = [
-        i for i in db.get_recent_incidents(limit=1000)
-        if technique_id in i.mitre_techniques
-    ]
+    incidents = db.get_incidents_by_technique(technique_id, limit=1000)
     
     return {
         "status": "success",
@@ -209,7 +264,7 @@ async def get_mitre_technique(technique_id: str):
             "incident_count": len(incidents),
             "recent_incidents": [i.model_dump(mode='json') for i in incidents[:10]]
         },
-        "timestamp": datetime.utcnow().isoformat()
+        "timestamp": _now_iso_cached()
     }
 
 
@@ -218,33 +273,28 @@ async def get_mitre_technique(technique_id: str):
 # ============================================================================
 
 @router.get("/threat-actors")
-async def get_threat_actors():
+async def get_threat_actors(db: ThreatIntelDB = Depends(get_db_dep)):
     """Get top threat actors"""
-    db = get_db()
     actors = db.get_top_threat_actors(limit=10)
     
     return {
         "status": "success",
         "data": [a.model_dump(mode='json') for a in actors],
         "count": len(actors),
-        "timestamp": datetime.utcnow().isoformat()
+        "timestamp": _now_iso_cached()
     }
 
 
 @router.get("/threat-actors/{actor_id}")
-async def get_threat_actor(actor_id: str):
+async def get_threat_actor(actor_id: str, db: ThreatIntelDB = Depends(get_db_dep)):
     """Get detailed threat actor information"""
-    db = get_db()
     actor = db.get_actor(actor_id)
     
     if not actor:
         raise HTTPException(status_code=404, detail="Threat actor not found")
     
     # Get incidents attributed to this actor
-    incidents = [
-        i for i in db.get_recent_incidents(limit=1000)
-        if i.threat_actor == actor_id
-    ]
+    incidents = db.get_incidents_by_actor(actor_id, limit=1000)
     
     return {
         "status": "success",
@@ -253,7 +303,7 @@ async def get_threat_actor(actor_id: str):
             "incident_count": len(incidents),
             "recent_incidents": [i.model_dump(mode='json') for i in incidents[:10]]
         },
-        "timestamp": datetime.utcnow().isoformat()
+        "timestamp": _now_iso_cached()
     }
 
 
@@ -262,9 +312,8 @@ async def get_threat_actor(actor_id: str):
 # ============================================================================
 
 @router.get("/ip-reputation/{ip_address}")
-async def check_ip_reputation(ip_address: str):
+async def check_ip_reputation(ip_address: str, db: ThreatIntelDB = Depends(get_db_dep)):
     """Check reputation of an IP address"""
-    db = get_db()
     reputation = db.check_ip_reputation(ip_address)
     
     if not reputation:
@@ -277,10 +326,7 @@ async def check_ip_reputation(ip_address: str):
         )
     
     # Get incidents from this IP
-    incidents = [
-        i for i in db.get_recent_incidents(limit=1000)
-        if i.source_ip == ip_address
-    ]
+    incidents = db.get_incidents_by_source_ip(ip_address, limit=1000)
     
     return {
         "status": "success",
@@ -289,21 +335,23 @@ async def check_ip_reputation(ip_address: str):
             "incident_count": len(incidents),
             "recent_incidents": [i.model_dump(mode='json') for i in incidents[:10]]
         },
-        "timestamp": datetime.utcnow().isoformat()
+        "timestamp": _now_iso_cached()
     }
 
 
 @router.get("/ip-reputation/top")
-async def get_top_malicious_ips(limit: int = Query(10, ge=1, le=100)):
+async def get_top_malicious_ips(
+    limit: int = Query(10, ge=1, le=100),
+    db: ThreatIntelDB = Depends(get_db_dep)
+):
     """Get top malicious IP addresses"""
-    db = get_db()
     ips = db.get_top_malicious_ips(limit=limit)
     
     return {
         "status": "success",
         "data": [ip.model_dump(mode='json') for ip in ips],
         "count": len(ips),
-        "timestamp": datetime.utcnow().isoformat()
+        "timestamp": _now_iso_cached()
     }
 
 
@@ -315,7 +363,8 @@ async def get_top_malicious_ips(limit: int = Query(10, ge=1, le=100)):
 async def websocket_live_threats(websocket: WebSocket):
     """WebSocket endpoint for real-time threat updates"""
     await websocket.accept()
-    active_connections.append(websocket)
+    active_connections.add(websocket)
+    db = get_db()
     
     try:
         while True:
@@ -323,28 +372,29 @@ async def websocket_live_threats(websocket: WebSocket):
             await asyncio.sleep(5)
             
             incident = threat_gen.generate_incident()
-            db = get_db()
             db.add_incident(incident)
             
-            # Broadcast to all connected clients
-            message = {
+            # Broadcast to all connected clients: serialize once, send concurrently
+            payload = orjson.dumps({
                 "type": "new_incident",
                 "data": incident.model_dump(mode='json'),
-                "timestamp": datetime.utcnow().isoformat()
-            }
+                "timestamp": _now_iso_cached()
+            }).decode()
             
-            for connection in active_connections:
-                try:
-                    await connection.send_json(message)
-                except:
-                    pass
+            connections = tuple(active_connections)
+            results = await asyncio.gather(
+                *(connection.send_text(payload) for connection in connections),
+                return_exceptions=True
+            )
+            for connection, result in zip(connections, results):
+                if isinstance(result, Exception):
+                    active_connections.discard(connection)
     
     except WebSocketDisconnect:
-        active_connections.remove(websocket)
+        active_connections.discard(websocket)
     except Exception as e:
         print(f"WebSocket error: {e}")
-        if websocket in active_connections:
-            active_connections.remove(websocket)
+        active_connections.discard(websocket)
 
 
 # ============================================================================
@@ -352,33 +402,29 @@ async def websocket_live_threats(websocket: WebSocket):
 # ============================================================================
 
 @router.post("/demo/generate-incidents")
-async def generate_demo_incidents(count: int = Query(10, ge=1, le=100)):
+async def generate_demo_incidents(
+    count: int = Query(10, ge=1, le=100),
+    db: ThreatIntelDB = Depends(get_db_dep)
+):
     """Generate demo incidents for testing"""
-    db = get_db()
-    incidents = []
-    
-    for _ in range(count):
-        incident = threat_gen.generate_incident()
-        db.add_incident(incident)
-        incidents.append(incident)
+    incidents = db.add_incidents_bulk(threat_gen.generate_batch(count))
     
     return {
         "status": "success",
         "message": f"Generated {count} demo incidents",
         "data": [i.model_dump(mode='json') for i in incidents],
-        "timestamp": datetime.utcnow().isoformat()
+        "timestamp": _now_iso_cached()
     }
 
 
 @router.get("/health")
-async def health_check():
+async def health_check(db: ThreatIntelDB = Depends(get_db_dep)):
     """Health check endpoint"""
-    db = get_db()
     summary = db.get_summary()
     
     return {
         "status": "healthy",
         "service": "threat-intelligence",
         "incidents_count": summary.total_incidents,
-        "timestamp": datetime.utcnow().isoformat()
+        "timestamp": _now_iso_cached()
     }
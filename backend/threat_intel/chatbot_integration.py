@@ -3,17 +3,53 @@ Threat Intelligence Chatbot Integration
 Enables the chatbot to query and explain threat data.
 """
 
+import re
+import time
+from functools import wraps
 from typing import List, Optional
-from .database import get_db
+from .database import AGGREGATE_CACHE_TTL, get_db
 from .models import ThreatIncident, ThreatActor, MITRETechnique
 
+# Query parsing patterns, compiled once
+_MITRE_RE = re.compile(r'T\d{4}')
+_IP_RE = re.compile(r'\b(?:\d{1,3}\.){3}\d{1,3}\b')
+_WORD_RE = re.compile(r'[a-z0-9]+')
+_CRITICAL_WORDS = frozenset({'critical', 'urgent', 'severe'})
+_SUMMARY_WORDS = frozenset({'summary', 'overview', 'status'})
+
+
+def _versioned_cache(method):
+    """Memoize a report builder until the database version changes or the TTL lapses.
+
+    The TTL keeps time-windowed figures (last 24h / 7d) from going stale when
+    no new incidents arrive.
+    """
+    @wraps(method)
+    def wrapper(self, *args):
+        version = self.db.version
+        if version != self._cache_version:
+            self._cache.clear()
+            self._cache_version = version
+        key = (method.__name__, args)
+        now = time.monotonic()
+        entry = self._cache.get(key)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+        value = method(self, *args)
+        self._cache[key] = (now + AGGREGATE_CACHE_TTL, value)
+        return value
+    return wrapper
+
 
 class ThreatIntelligenceAdvisor:
     """Advisor for threat intelligence queries"""
     
     def __init__(self):
         self.db = get_db()
+        self._cache = {}
+        self._cache_version = self.db.version
     
+    @_versioned_cache
     def get_critical_threats(self) -> str:
         """Get summary of critical threats"""
         db = self.db
@@ -22,17 +58,18 @@ class ThreatIntelligenceAdvisor:
         if not critical:
             return "No critical threats detected at this time."
         
-        summary = f"Found {len(critical)} critical threats:\n\n"
+        parts = [f"Found {len(critical)} critical threats:\n\n"]
         for inc in critical[:5]:
-            summary += f"• {inc.attack_type} on {inc.target_service}\n"
-            summary += f"  Source: {inc.source_ip}\n"
-            summary += f"  Confidence: {inc.confidence*100:.0f}%\n"
+            parts.append(f"• {inc.attack_type} on {inc.target_service}\n")
+            parts.append(f"  Source: {inc.source_ip}\n")
+            parts.append(f"  Confidence: {inc.confidence*100:.0f}%\n")
             if inc.threat_actor:
-                summary += f"  Actor: {inc.threat_actor}\n"
-            summary += "\n"
+                parts.append(f"  Actor: {inc.threat_actor}\n")
+            parts.append("\n")
         
-        return summary
+        return "".join(parts)
     
+    @_versioned_cache
     def explain_mitre_technique(self, technique_id: str) -> str:
         """Explain a MITRE ATT&CK technique"""
         technique = self.db.get_technique(technique_id)
@@ -40,31 +77,28 @@ class ThreatIntelligenceAdvisor:
         if not technique:
             return f"Technique {technique_id} not found in database."
         
-        explanation = f"**{technique.id}: {technique.name}**\n\n"
-        explanation += f"**Tactic:** {technique.tactic}\n\n"
-        explanation += f"**Description:** {technique.description}\n\n"
+        parts = [f"**{technique.id}: {technique.name}**\n\n"]
+        parts.append(f"**Tactic:** {technique.tactic}\n\n")
+        parts.append(f"**Description:** {technique.description}\n\n")
         
         if technique.mitigations:
-            explanation += "**Mitigations:**\n"
+            parts.append("**Mitigations:**\n")
             for mitigation in technique.mitigations:
-                explanation += f"• {mitigation}\n"
-            explanation += "\n"
+                parts.append(f"• {mitigation}\n")
+            parts.append("\n")
         
         if technique.detection_methods:
-            explanation += "**Detection Methods:**\n"
+            parts.append("**Detection Methods:**\n")
             for method in technique.detection_methods:
-                explanation += f"• {method}\n"
+                parts.append(f"• {method}\n")
         
         # Get incidents using this technique
-        incidents = [
-            i for i in self.db.get_recent_incidents(limit=1000)
-            if technique_id in i.mitre_techniques
-        ]
+        incidents = self.db.get_incidents_by_technique(technique_id, limit=1000)
         
         if incidents:
-            explanation += f"\n**Recent Incidents:** {len(incidents)} incidents detected using this technique"
+            parts.append(f"\n**Recent Incidents:** {len(incidents)} incidents detected using this technique")
         
-        return explanation
+        return "".join(parts)
     
     def check_ip_reputation(self, ip: str) -> str:
         """Check IP reputation"""
@@ -92,6 +126,7 @@ class ThreatIntelligenceAdvisor:
         
         return report
     
+    @_versioned_cache
     def get_threat_actor_info(self, actor_id: str) -> str:
         """Get threat actor information"""
         actor = self.db.get_actor(actor_id)
@@ -99,35 +134,33 @@ class ThreatIntelligenceAdvisor:
         if not actor:
             return f"Threat actor {actor_id} not found in database."
         
-        info = f"**{actor.name}**\n\n"
+        parts = [f"**{actor.name}**\n\n"]
         
         if actor.aliases:
-            info += f"**Aliases:** {', '.join(actor.aliases)}\n\n"
+            parts.append(f"**Aliases:** {', '.join(actor.aliases)}\n\n")
         
-        info += f"**Description:** {actor.description}\n\n"
+        parts.append(f"**Description:** {actor.description}\n\n")
         
         if actor.targets:
-            info += f"**Target Industries:** {', '.join(actor.targets)}\n\n"
+            parts.append(f"**Target Industries:** {', '.join(actor.targets)}\n\n")
         
         if actor.techniques:
-            info += f"**Known Techniques:** {', '.join(actor.techniques)}\n\n"
+            parts.append(f"**Known Techniques:** {', '.join(actor.techniques)}\n\n")
         
-        info += f"**Threat Level:** {actor.threat_level.upper()}\n"
+        parts.append(f"**Threat Level:** {actor.threat_level.upper()}\n")
         
         if actor.last_seen:
-            info += f"**Last Seen:** {actor.last_seen}\n"
+            parts.append(f"**Last Seen:** {actor.last_seen}\n")
         
         # Get incidents attributed to this actor
-        incidents = [
-            i for i in self.db.get_recent_incidents(limit=1000)
-            if i.threat_actor == actor_id
-        ]
+        incidents = self.db.get_incidents_by_actor(actor_id, limit=1000)
         
         if incidents:
-            info += f"\n**Recent Activity:** {len(incidents)} incidents attributed to this actor"
+            parts.append(f"\n**Recent Activity:** {len(incidents)} incidents attributed to this actor")
         
-        return info
+        return "".join(parts)
     
+    @_versioned_cache
     def get_threat_summary(self) -> str:
         """Get overall threat summary"""
         summary = self.db.get_summary()
@@ -145,72 +178,73 @@ class ThreatIntelligenceAdvisor:
         
         return report
     
+    @_versioned_cache
     def get_attack_analysis(self) -> str:
         """Get attack type analysis"""
         distribution = self.db.get_attack_distribution()
         
-        analysis = "**Attack Type Analysis**\n\n"
+        parts = ["**Attack Type Analysis**\n\n"]
         
         for attack in distribution:
-            analysis += f"**{attack.type.replace('_', ' ')}**\n"
-            analysis += f"• Count: {attack.count}\n"
-            analysis += f"• Percentage: {attack.percentage:.1f}%\n"
-            analysis += "\n"
+            parts.append(f"**{attack.type.replace('_', ' ')}**\n")
+            parts.append(f"• Count: {attack.count}\n")
+            parts.append(f"• Percentage: {attack.percentage:.1f}%\n")
+            parts.append("\n")
         
-        return analysis
+        return "".join(parts)
     
+    @_versioned_cache
     def generate_threat_report(self) -> str:
         """Generate comprehensive threat report"""
         summary = self.db.get_summary()
         distribution = self.db.get_attack_distribution()
         actors = self.db.get_top_threat_actors(limit=3)
         
-        report = "# THREAT INTELLIGENCE REPORT\n\n"
+        parts = ["# THREAT INTELLIGENCE REPORT\n\n"]
         
-        report += "## Executive Summary\n"
-        report += f"- Total Incidents: {summary.total_incidents}\n"
-        report += f"- Critical Threats: {summary.critical}\n"
-        report += f"- Trend: {summary.trend}\n\n"
+        parts.append("## Executive Summary\n")
+        parts.append(f"- Total Incidents: {summary.total_incidents}\n")
+        parts.append(f"- Critical Threats: {summary.critical}\n")
+        parts.append(f"- Trend: {summary.trend}\n\n")
         
-        report += "## Attack Distribution\n"
+        parts.append("## Attack Distribution\n")
         for attack in distribution[:5]:
-            report += f"- {attack.type.replace('_', ' ')}: {attack.count} ({attack.percentage:.1f}%)\n"
-        report += "\n"
+            parts.append(f"- {attack.type.replace('_', ' ')}: {attack.count} ({attack.percentage:.1f}%)\n")
+        parts.append("\n")
         
-        report += "## Top Threat Actors\n"
+        parts.append("## Top Threat Actors\n")
         for actor in actors:
-            report += f"- {actor.name} ({actor.threat_level.upper()})\n"
-        report += "\n"
+            parts.append(f"- {actor.name} ({actor.threat_level.upper()})\n")
+        parts.append("\n")
         
-        report += "## Recommendations\n"
-        report += "1. Prioritize mitigation of critical threats\n"
-        report += "2. Monitor top threat actors for new campaigns\n"
-        report += "3. Review and update detection rules\n"
-        report += "4. Conduct threat hunting for indicators of compromise\n"
+        parts.append("## Recommendations\n")
+        parts.append("1. Prioritize mitigation of critical threats\n")
+        parts.append("2. Monitor top threat actors for new campaigns\n")
+        parts.append("3. Review and update detection rules\n")
+        parts.append("4. Conduct threat hunting for indicators of compromise\n")
         
-        return report
+        return "".join(parts)
     
     def process_query(self, query: str) -> str:
         """Process natural language threat intelligence queries"""
         query_lower = query.lower()
+        query_words = set(_WORD_RE.findall(query_lower))
         
         # Critical threats
-        if any(word in query_lower for word in ['critical', 'urgent', 'severe']):
+        if _CRITICAL_WORDS & query_words:
             return self.get_critical_threats()
         
         # MITRE techniques
         if 'mitre' in query_lower or 't1' in query_lower:
             # Extract technique ID
-            import re
-            match = re.search(r'(T\d{4})', query)
+            match = _MITRE_RE.search(query)
             if match:
-                return self.explain_mitre_technique(match.group(1))
+                return self.explain_mitre_technique(match.group(0))
             return "Please specify a MITRE technique ID (e.g., T1499)"
         
         # IP reputation
         if 'ip' in query_lower or 'reputation' in query_lower:
-            import re
-            match = re.search(r'\b(?:\d{1,3}\.){3}\d{1,3}\b', query)
+            match = _IP_RE.search(query)
             if match:
                 return self.check_ip_reputation(match.group(0))
             return "Please provide an IP address to check"
@@ -225,7 +259,7 @@ class ThreatIntelligenceAdvisor:
             return "Please specify a threat actor name"
         
         # Summary
-        if any(word in query_lower for word in ['summary', 'overview', 'status']):
+        if _SUMMARY_WORDS & query_words:
             return self.get_threat_summary()
         
         # Analysis
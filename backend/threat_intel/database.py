@@ -1,15 +1,20 @@
 """
 Threat Intelligence Database Layer
-In-memory storage with persistence to JSON for development.
+In-memory storage with persistence to an append-only JSONL log for development.
 For production, replace with PostgreSQL.
 """
 
+import atexit
+import bisect
 import json
+import sys
 from pathlib import Path
-from datetime import datetime, timedelta
-from typing import List, Optional, Dict
-from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Dict, Tuple
+from collections import Counter, defaultdict, deque
+from functools import lru_cache, wraps
 import threading
+import time
 
 from .models import (
     ThreatIncident, ThreatActor, MITRETechnique, IPReputation,
@@ -17,8 +22,52 @@ from .models import (
 )
 
 
+AGGREGATE_CACHE_TTL = 3.0  # seconds
+INDEX_BUCKET_MAXLEN = 1000  # newest incidents kept per secondary-index key
+WRITE_BATCH_MAX = 1000  # incidents appended to the log per write
+WRITE_RETRY_SECONDS = 1.0  # pause before retrying a failed log append
+COMPACT_RATIO = 2  # rewrite the log once it holds this many records per live incident
+_DELTA_24H = timedelta(hours=24)
+_DELTA_7D = timedelta(days=7)
+
+
+def _ttl_cached(method):
+    """Cache an aggregation per arguments for AGGREGATE_CACHE_TTL seconds.
+
+    Entries are also invalidated as soon as the database version changes, so
+    writes are visible immediately while dashboard polling reuses the result.
+    """
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        key = (method.__name__, args, tuple(sorted(kwargs.items())))
+        now = time.monotonic()
+        entry = self._aggregate_cache.get(key)
+        if entry is not None and entry[0] == self._version and entry[1] > now:
+            return entry[2]
+        version = self._version
+        value = method(self, *args, **kwargs)
+        self._aggregate_cache[key] = (version, now + AGGREGATE_CACHE_TTL, value)
+        return value
+    return wrapper
+
+
+def _version_cached(method):
+    """Cache a time-independent aggregation until the database version changes."""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        key = (method.__name__, args, tuple(sorted(kwargs.items())))
+        entry = self._aggregate_cache.get(key)
+        if entry is not None and entry[0] == self._version:
+            return entry[2]
+        version = self._version
+        value = method(self, *args, **kwargs)
+        self._aggregate_cache[key] = (version, None, value)
+        return value
+    return wrapper
+
+
 class ThreatIntelDB:
-    """In-memory threat intelligence database with JSON persistence"""
+    """In-memory threat intelligence database with JSONL log persistence"""
     
     def __init__(self, data_dir: Path = None):
         self.data_dir = data_dir or Path(__file__).parent.parent.parent / "data" / "threat_intel"
@@ -29,32 +78,151 @@ class ThreatIntelDB:
         self.techniques: Dict[str, MITRETechnique] = {}
         self.ip_reputation: Dict[str, IPReputation] = {}
         
+        # Secondary indexes (key -> newest incidents) so filtered lookups touch only matches
+        self._by_attack_type: Dict[AttackType, deque] = defaultdict(self._new_bucket)
+        self._by_technique: Dict[str, deque] = defaultdict(self._new_bucket)
+        self._by_actor: Dict[str, deque] = defaultdict(self._new_bucket)
+        self._by_source_ip: Dict[str, deque] = defaultdict(self._new_bucket)
+        
+        # (timestamp, id) pairs kept sorted, for bisecting time windows
+        self._by_time: List[Tuple[datetime, str]] = []
+        
+        # Running aggregates, updated on every insert/replace
+        self._severity_counts: Counter = Counter()
+        self._attack_counts: Dict[AttackType, Counter] = defaultdict(Counter)
+        self._actor_counts: Counter = Counter()
+        self._techniques_seen: Counter = Counter()
+        
+        # Bumped on every write; invalidates cached aggregations
+        self._version = 0
+        self._aggregate_cache: Dict[tuple, tuple] = {}
+        
+        # Persistence runs off the write path: inserts queue incidents here and a
+        # background writer appends them to the log. _io_cond guards the queue and
+        # the log file; _lock only guards the in-memory state.
+        self._write_queue: deque = deque()
+        self._io_cond = threading.Condition(threading.Lock())
+        self._log_records = 0
+        
         self._lock = threading.RLock()
         self._load_data()
         self._initialize_seed_data()
+        
+        self._writer = threading.Thread(target=self._writer_loop, name="threat-intel-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.flush)
+    
+    @property
+    def version(self) -> int:
+        """Monotonic write counter; changes whenever incidents or IP data change"""
+        return self._version
+    
+    @property
+    def _log_file(self) -> Path:
+        return self.data_dir / "incidents.jsonl"
     
     def _load_data(self):
-        """Load data from JSON files"""
+        """Load incidents from the JSONL log (later records replace earlier ones)"""
         try:
-            incidents_file = self.data_dir / "incidents.json"
-            if incidents_file.exists():
-                with open(incidents_file) as f:
-                    data = json.load(f)
-                    for inc_data in data:
-                        inc = ThreatIncident(**inc_data)
-                        self.incidents[inc.id] = inc
+            if self._log_file.exists():
+                with open(self._log_file, encoding='utf-8') as f:
+                    for line in f:
+                        if line.strip():
+                            self._store_incident(self._intern(ThreatIncident.model_validate_json(line)))
+                            self._log_records += 1
+            else:
+                # Migrate the legacy single-array snapshot to the log format
+                legacy_file = self.data_dir / "incidents.json"
+                if legacy_file.exists():
+                    with open(legacy_file) as f:
+                        for inc_data in json.load(f):
+                            self._store_incident(self._intern(ThreatIncident(**inc_data)))
+                    self.compact()
         except Exception as e:
             print(f"Warning: Could not load incidents: {e}")
     
-    def _save_data(self):
-        """Persist data to JSON files"""
+    @staticmethod
+    def _intern(incident: ThreatIncident) -> ThreatIncident:
+        """Share the low-cardinality strings of a deserialized incident.
+        
+        Parsing allocates a fresh str per field per record; interning collapses
+        them to one object per distinct value.
+        """
+        incident.source_ip = sys.intern(incident.source_ip)
+        incident.target_service = sys.intern(incident.target_service)
+        incident.description = sys.intern(incident.description)
+        incident.status = sys.intern(incident.status)
+        if incident.threat_actor:
+            incident.threat_actor = sys.intern(incident.threat_actor)
+        incident.mitre_techniques = [sys.intern(t) for t in incident.mitre_techniques]
+        metadata = incident.metadata
+        for key in ("detection_method", "model_name"):
+            if isinstance(metadata.get(key), str):
+                metadata[key] = sys.intern(metadata[key])
+        return incident
+    
+    def _write_batch(self) -> bool:
+        """Append up to WRITE_BATCH_MAX queued incidents to the log (caller holds _io_cond)
+        
+        Incidents leave the queue only once written: a failed batch goes back to
+        the front (a partial append is harmless, later records replace earlier
+        ones) and False is returned.
+        """
+        batch = [self._write_queue.popleft() for _ in range(min(len(self._write_queue), WRITE_BATCH_MAX))]
+        try:
+            lines = "".join(inc.model_dump_json() + "\n" for inc in batch)
+            with open(self._log_file, 'a', encoding='utf-8') as f:
+                f.write(lines)
+        except Exception as e:
+            print(f"Warning: Could not save incidents, will retry: {e}")
+            self._write_queue.extendleft(reversed(batch))
+            return False
+        self._log_records += len(batch)
+        # Replaced incidents leave stale records behind; reclaim them occasionally
+        if self._log_records > COMPACT_RATIO * len(self.incidents):
+            self._compact_locked()
+        return True
+    
+    def _writer_loop(self):
+        """Background writer: persist queued incidents as they arrive"""
+        while True:
+            with self._io_cond:
+                while not self._write_queue:
+                    self._io_cond.wait()
+                if not self._write_batch():
+                    # Keep the batch queued and back off instead of spinning on the error
+                    self._io_cond.wait(WRITE_RETRY_SECONDS)
+    
+    def _enqueue_writes(self, incidents: List[ThreatIncident]):
+        """Hand incidents to the background writer"""
+        with self._io_cond:
+            self._write_queue.extend(incidents)
+            self._io_cond.notify()
+    
+    def flush(self):
+        """Synchronously persist everything still queued for the writer"""
+        with self._io_cond:
+            while self._write_queue:
+                if not self._write_batch():
+                    break  # still queued; the writer keeps retrying
+    
+    def _compact_locked(self):
+        """Rewrite the log with exactly one record per live incident (caller holds _io_cond)"""
+        with self._lock:
+            snapshot = list(self.incidents.values())
         try:
-            incidents_file = self.data_dir / "incidents.json"
-            with open(incidents_file, 'w') as f:
-                data = [inc.model_dump(mode='json') for inc in self.incidents.values()]
-                json.dump(data, f, indent=2, default=str)
+            tmp_file = self._log_file.with_suffix(".jsonl.tmp")
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                f.write("".join(inc.model_dump_json() + "\n" for inc in snapshot))
+            tmp_file.replace(self._log_file)
+            self._log_records = len(snapshot)
         except Exception as e:
-            print(f"Warning: Could not save incidents: {e}")
+            print(f"Warning: Could not compact incidents: {e}")
+    
+    def compact(self):
+        """Rewrite the log with exactly one record per live incident"""
+        with self._io_cond:
+            self._compact_locked()
     
     def _initialize_seed_data(self):
         """Initialize with seed threat data"""
@@ -133,13 +301,90 @@ class ThreatIntelDB:
             ),
         }
     
+    @staticmethod
+    def _new_bucket() -> deque:
+        """Bounded index bucket; the oldest entries fall off as new ones arrive"""
+        return deque(maxlen=INDEX_BUCKET_MAXLEN)
+    
+    def _index_buckets(self, incident: ThreatIncident):
+        """Yield the secondary-index buckets an incident belongs to"""
+        yield self._by_attack_type[incident.attack_type]
+        yield self._by_source_ip[incident.source_ip]
+        if incident.threat_actor:
+            yield self._by_actor[incident.threat_actor]
+        for technique_id in set(incident.mitre_techniques):
+            yield self._by_technique[technique_id]
+    
+    @staticmethod
+    def _bump(counter: Counter, key, delta: int):
+        """Apply delta to a counter, dropping keys that reach zero"""
+        counter[key] += delta
+        if counter[key] <= 0:
+            del counter[key]
+    
+    @staticmethod
+    def _time_key(incident: ThreatIncident) -> Tuple[datetime, str]:
+        """Sort key for the time index (aware timestamps are normalized to naive UTC)"""
+        ts = incident.timestamp
+        if ts.tzinfo is not None:
+            ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+        return (ts, incident.id)
+    
+    def _count_since(self, cutoff: datetime) -> int:
+        """Number of incidents with timestamp >= cutoff"""
+        return len(self._by_time) - bisect.bisect_left(self._by_time, (cutoff,))
+    
+    def _update_indexes(self, incident: ThreatIncident, delta: int = 1):
+        """Add (delta=+1) or retract (delta=-1) an incident from the running aggregates"""
+        self._bump(self._severity_counts, incident.severity, delta)
+        self._bump(self._attack_counts[incident.attack_type], incident.severity, delta)
+        if not self._attack_counts[incident.attack_type]:
+            del self._attack_counts[incident.attack_type]
+        if incident.threat_actor:
+            self._bump(self._actor_counts, incident.threat_actor, delta)
+        for technique_id in set(incident.mitre_techniques):
+            self._bump(self._techniques_seen, technique_id, delta)
+        
+        key = self._time_key(incident)
+        if delta > 0:
+            bisect.insort(self._by_time, key)
+        else:
+            i = bisect.bisect_left(self._by_time, key)
+            if i < len(self._by_time) and self._by_time[i] == key:
+                del self._by_time[i]
+    
+    def _store_incident(self, incident: ThreatIncident):
+        """Insert or replace an incident and keep the secondary indexes in sync"""
+        previous = self.incidents.get(incident.id)
+        if previous is not None:
+            for bucket in self._index_buckets(previous):
+                try:
+                    bucket.remove(previous)
+                except ValueError:
+                    pass  # already evicted from the bounded bucket
+            self._update_indexes(previous, -1)
+        self.incidents[incident.id] = incident
+        for bucket in self._index_buckets(incident):
+            bucket.append(incident)
+        self._update_indexes(incident, +1)
+    
     def add_incident(self, incident: ThreatIncident) -> ThreatIncident:
         """Add a new threat incident"""
         with self._lock:
-            self.incidents[incident.id] = incident
-            self._save_data()
+            self._store_incident(incident)
+            self._version += 1
+        self._enqueue_writes([incident])
         return incident
     
+    def add_incidents_bulk(self, incidents: List[ThreatIncident]) -> List[ThreatIncident]:
+        """Add many incidents under a single lock acquisition"""
+        with self._lock:
+            for incident in incidents:
+                self._store_incident(incident)
+            self._version += 1
+        self._enqueue_writes(incidents)
+        return incidents
+    
     def get_incident(self, incident_id: str) -> Optional[ThreatIncident]:
         """Get incident by ID"""
         return self.incidents.get(incident_id)
@@ -147,59 +392,76 @@ class ThreatIntelDB:
     def get_recent_incidents(self, limit: int = 50, hours: int = 24) -> List[ThreatIncident]:
         """Get recent incidents"""
         cutoff = datetime.utcnow() - timedelta(hours=hours)
-        incidents = [
-            inc for inc in self.incidents.values()
-            if inc.timestamp >= cutoff
-        ]
+        start = max(bisect.bisect_left(self._by_time, (cutoff,)), len(self._by_time) - limit)
+        return [self.incidents[inc_id] for _, inc_id in reversed(self._by_time[start:])]
+    
+    def _recent_from_index(self, index: Dict, key, limit: int, hours: int) -> List[ThreatIncident]:
+        """Recent incidents from one secondary-index bucket, newest first"""
+        bucket = index.get(key)
+        if not bucket:
+            return []
+        cutoff = datetime.utcnow() - timedelta(hours=hours)
+        incidents = [inc for inc in bucket if inc.timestamp >= cutoff]
         return sorted(incidents, key=lambda x: x.timestamp, reverse=True)[:limit]
     
+    def get_incidents_by_attack_type(self, attack_type: AttackType, limit: int = 50, hours: int = 24) -> List[ThreatIncident]:
+        """Get recent incidents of an attack type"""
+        return self._recent_from_index(self._by_attack_type, attack_type, limit, hours)
+    
+    def get_incidents_by_technique(self, technique_id: str, limit: int = 50, hours: int = 24) -> List[ThreatIncident]:
+        """Get recent incidents using a MITRE technique"""
+        return self._recent_from_index(self._by_technique, technique_id, limit, hours)
+    
+    def get_incidents_by_actor(self, actor_id: str, limit: int = 50, hours: int = 24) -> List[ThreatIncident]:
+        """Get recent incidents attributed to a threat actor"""
+        return self._recent_from_index(self._by_actor, actor_id, limit, hours)
+    
+    def get_incidents_by_source_ip(self, ip: str, limit: int = 50, hours: int = 24) -> List[ThreatIncident]:
+        """Get recent incidents originating from an IP address"""
+        return self._recent_from_index(self._by_source_ip, ip, limit, hours)
+    
     def get_incidents_by_severity(self, severity: SeverityLevel) -> List[ThreatIncident]:
         """Get incidents by severity level"""
         return [inc for inc in self.incidents.values() if inc.severity == severity]
     
+    @_ttl_cached
     def get_summary(self) -> ThreatSummary:
         """Get threat summary statistics"""
         now = datetime.utcnow()
-        last_24h = now - timedelta(hours=24)
-        last_7d = now - timedelta(days=7)
+        last_24h = now - _DELTA_24H
+        last_7d = now - _DELTA_7D
         
-        all_incidents = list(self.incidents.values())
-        incidents_24h = [i for i in all_incidents if i.timestamp >= last_24h]
-        incidents_7d = [i for i in all_incidents if i.timestamp >= last_7d]
+        count_24h = self._count_since(last_24h)
+        count_7d = self._count_since(last_7d)
         
-        severity_counts = defaultdict(int)
-        for inc in all_incidents:
-            severity_counts[inc.severity] += 1
+        severity_counts = self._severity_counts
         
         # Calculate trend
-        if len(incidents_7d) > 0 and len(incidents_24h) > 0:
-            trend_pct = ((len(incidents_24h) - len(incidents_7d) / 7) / (len(incidents_7d) / 7)) * 100
+        if count_7d > 0 and count_24h > 0:
+            trend_pct = ((count_24h - count_7d / 7) / (count_7d / 7)) * 100
             trend = f"{trend_pct:+.1f}%"
         else:
             trend = "0%"
         
         return ThreatSummary(
-            total_incidents=len(all_incidents),
+            total_incidents=len(self.incidents),
             critical=severity_counts[SeverityLevel.CRITICAL],
             high=severity_counts[SeverityLevel.HIGH],
             medium=severity_counts[SeverityLevel.MEDIUM],
             low=severity_counts[SeverityLevel.LOW],
             info=severity_counts[SeverityLevel.INFO],
             trend=trend,
-            last_24h_incidents=len(incidents_24h),
-            last_7d_incidents=len(incidents_7d)
+            last_24h_incidents=count_24h,
+            last_7d_incidents=count_7d
         )
     
+    @_version_cached
     def get_attack_distribution(self) -> List[AttackDistribution]:
         """Get attack type distribution"""
-        attack_counts = defaultdict(lambda: defaultdict(int))
         total = len(self.incidents)
         
-        for inc in self.incidents.values():
-            attack_counts[inc.attack_type][inc.severity] += 1
-        
         distributions = []
-        for attack_type, severity_breakdown in attack_counts.items():
+        for attack_type, severity_breakdown in self._attack_counts.items():
             count = sum(severity_breakdown.values())
             distributions.append(AttackDistribution(
                 type=attack_type,
@@ -210,16 +472,17 @@ class ThreatIntelDB:
         
         return sorted(distributions, key=lambda x: x.count, reverse=True)
     
+    @_version_cached
     def get_top_threat_actors(self, limit: int = 5) -> List[ThreatActor]:
         """Get top threat actors by incident count"""
-        actor_counts = defaultdict(int)
-        for inc in self.incidents.values():
-            if inc.threat_actor:
-                actor_counts[inc.threat_actor] += 1
-        
-        top_actors = sorted(actor_counts.items(), key=lambda x: x[1], reverse=True)[:limit]
+        top_actors = self._actor_counts.most_common(limit)
         return [self.actors[actor_id] for actor_id, _ in top_actors if actor_id in self.actors]
     
+    def get_actor_incident_counts(self) -> Dict[str, int]:
+        """Get incident counts per threat actor"""
+        return dict(self._actor_counts)
+    
+    @_version_cached
     def get_top_malicious_ips(self, limit: int = 10) -> List[IPReputation]:
         """Get top malicious IPs"""
         return sorted(
@@ -228,13 +491,10 @@ class ThreatIntelDB:
             reverse=True
         )[:limit]
     
+    @_version_cached
     def get_mitre_techniques_used(self) -> List[MITRETechnique]:
         """Get MITRE techniques used in recent incidents"""
-        techniques_used = set()
-        for inc in self.incidents.values():
-            techniques_used.update(inc.mitre_techniques)
-        
-        return [self.techniques[t] for t in techniques_used if t in self.techniques]
+        return [self.techniques[t] for t in self._techniques_seen if t in self.techniques]
     
     def check_ip_reputation(self, ip: str) -> Optional[IPReputation]:
         """Check reputation of an IP address"""
@@ -244,6 +504,7 @@ class ThreatIntelDB:
         """Add or update IP reputation"""
         with self._lock:
             self.ip_reputation[ip_rep.ip_address] = ip_rep
+            self._version += 1
     
     def get_technique(self, technique_id: str) -> Optional[MITRETechnique]:
         """Get MITRE technique details"""
@@ -254,13 +515,7 @@ class ThreatIntelDB:
         return self.actors.get(actor_id)
 
 
-# Global database instance
-_db_instance: Optional[ThreatIntelDB] = None
-
-
+@lru_cache(maxsize=1)
 def get_db() -> ThreatIntelDB:
-    """Get or create database instance"""
-    global _db_instance
-    if _db_instance is None:
-        _db_instance = ThreatIntelDB()
-    return _db_instance
+    """Get or create the shared database instance (get_db.cache_clear() resets it)"""
+    return ThreatIntelDB()
@@ -22,12 +22,11 @@ def initialize_threat_intel():
     print("\n📊 Generating initial threat data...")
     generator = ThreatGenerator()
     
-    # Generate 100 initial incidents
-    for i in range(100):
-        incident = generator.generate_incident()
-        db.add_incident(incident)
-        if (i + 1) % 20 == 0:
-            print(f"   Generated {i + 1} incidents...")
+    # Generate 100 initial incidents in batches, persisting once at the end
+    for generated in range(20, 101, 20):
+        db.add_incidents_bulk(generator.generate_batch(20))
+        print(f"   Generated {generated} incidents...")
+    db.flush()
     
     print(f"✅ Generated 100 initial incidents")
     
@@ -48,10 +47,10 @@ def initialize_threat_intel():
     
     # Print threat actors
     actors = db.get_top_threat_actors(limit=5)
+    counts = db.get_actor_incident_counts()
     print("\n👥 Top Threat Actors:")
     for actor in actors:
-        incidents = [i for i in db.get_recent_incidents(limit=1000) if i.threat_actor == actor.id]
-        print(f"   {actor.name}: {len(incidents)} incidents")
+        print(f"   {actor.name}: {counts.get(actor.id, 0)} incidents")
     
     print("\n" + "="*70)
     print("✅ THREAT INTELLIGENCE MODULE READY")
@@ -3,13 +3,21 @@ Threat Incident Generator
 Generates realistic threat incidents for testing and demo purposes.
 """
 
+import os
 import random
 import uuid
 from datetime import datetime, timedelta
+from itertools import accumulate, permutations
 from typing import List
 
+import numpy as np
+
 from .models import ThreatIncident, SeverityLevel, AttackType
 
+_ATTACK_TYPES = tuple(AttackType)
+_SEVERITIES = tuple(SeverityLevel)
+_MINUTE = timedelta(minutes=1)
+
 
 class ThreatGenerator:
     """Generate realistic threat incidents"""
@@ -81,6 +89,23 @@ class ThreatGenerator:
         AttackType.ANOMALY: {SeverityLevel.MEDIUM: 0.5, SeverityLevel.LOW: 0.3, SeverityLevel.INFO: 0.2},
     }
     
+    # Per attack type: (severities, cumulative weights) for random.choices
+    _SEVERITY_CHOICES = {
+        attack_type: (tuple(weights), tuple(accumulate(weights.values())))
+        for attack_type, weights in SEVERITY_WEIGHTS.items()
+    }
+    _DEFAULT_SEVERITY_CHOICE = ((SeverityLevel.MEDIUM,), (1.0,))
+    
+    CONFIDENCE_BASE = {
+        SeverityLevel.CRITICAL: 0.95,
+        SeverityLevel.HIGH: 0.85,
+        SeverityLevel.MEDIUM: 0.75,
+        SeverityLevel.LOW: 0.65,
+        SeverityLevel.INFO: 0.55,
+    }
+    
+    ATTRIBUTED_SEVERITIES = frozenset({SeverityLevel.CRITICAL, SeverityLevel.HIGH})
+    
     INTERNAL_IPS = [
         "192.168.1.0/24",
         "10.0.0.0/8",
@@ -106,12 +131,43 @@ class ThreatGenerator:
         "app-server-02",
     ]
     
+    DESTINATION_PORTS = (22, 80, 443, 3306, 5432, 8080)
+    DETECTION_METHODS = ("ML Model", "Signature", "Heuristic", "Behavioral")
+    MODEL_NAMES = ("XGBoost", "CNN-LSTM", "Ensemble")
+    # Every host address in 192.168.1.0/24, formatted once
+    _INTERNAL_POOL = tuple(f"192.168.1.{i}" for i in range(1, 255))
+    
     def __init__(self):
         self.incident_counter = 0
+        # Tuple views of the class tables, built once instead of per incident
+        self._descriptions = {k: tuple(v) for k, v in self.ATTACK_DESCRIPTIONS.items()}
+        self._techniques = {
+            attack_type: (tuple(self.MITRE_TECHNIQUES.get(attack_type, ["T1087"])),
+                          min(2, len(self.MITRE_TECHNIQUES.get(attack_type, ["T1087"]))))
+            for attack_type in _ATTACK_TYPES
+        }
+        
+        # Lookup tables for the vectorized batch path (rows indexed by attack code)
+        self._rng = np.random.default_rng()
+        cdf = np.zeros((len(_ATTACK_TYPES), len(_SEVERITIES)))
+        for i, attack_type in enumerate(_ATTACK_TYPES):
+            weights = self.SEVERITY_WEIGHTS.get(attack_type, {SeverityLevel.MEDIUM: 1.0})
+            for severity, weight in weights.items():
+                cdf[i, _SEVERITIES.index(severity)] = weight
+        cdf = np.cumsum(cdf, axis=1)
+        cdf[:, -1] = 1.0  # guard against float round-off in the weights
+        self._severity_cdf = cdf
+        self._confidence_base = np.array([self.CONFIDENCE_BASE[s] for s in _SEVERITIES])
+        self._attributed = np.array([s in self.ATTRIBUTED_SEVERITIES for s in _SEVERITIES])
+        # Every ordered k-subset, so picking one uniformly matches random.sample
+        self._technique_perms = {
+            attack_type: tuple(list(p) for p in permutations(*self._techniques[attack_type]))
+            for attack_type in _ATTACK_TYPES
+        }
     
     def _get_random_internal_ip(self) -> str:
         """Generate random internal IP"""
-        return f"192.168.1.{random.randint(1, 254)}"
+        return random.choice(self._INTERNAL_POOL)
     
     def _get_random_external_ip(self) -> str:
         """Get random external IP"""
@@ -119,38 +175,28 @@ class ThreatGenerator:
     
     def _get_severity(self, attack_type: AttackType) -> SeverityLevel:
         """Get severity level based on attack type"""
-        weights = self.SEVERITY_WEIGHTS.get(attack_type, {SeverityLevel.MEDIUM: 1.0})
-        severities = list(weights.keys())
-        probabilities = list(weights.values())
-        return random.choices(severities, weights=probabilities, k=1)[0]
+        severities, cum_weights = self._SEVERITY_CHOICES.get(attack_type, self._DEFAULT_SEVERITY_CHOICE)
+        return random.choices(severities, cum_weights=cum_weights, k=1)[0]
     
     def generate_incident(self) -> ThreatIncident:
         """Generate a realistic threat incident"""
         self.incident_counter += 1
         
-        attack_type = random.choice(list(AttackType))
+        attack_type = random.choice(_ATTACK_TYPES)
         severity = self._get_severity(attack_type)
         
         # Determine if this is attributed to a known actor
         threat_actor = None
-        if severity in [SeverityLevel.CRITICAL, SeverityLevel.HIGH]:
+        if severity in self.ATTRIBUTED_SEVERITIES:
             threat_actor = random.choice(self.THREAT_ACTORS)
         
         # Generate confidence based on severity
-        confidence_base = {
-            SeverityLevel.CRITICAL: 0.95,
-            SeverityLevel.HIGH: 0.85,
-            SeverityLevel.MEDIUM: 0.75,
-            SeverityLevel.LOW: 0.65,
-            SeverityLevel.INFO: 0.55,
-        }
-        confidence = confidence_base[severity] + random.uniform(-0.05, 0.05)
+        confidence = self.CONFIDENCE_BASE[severity] + random.uniform(-0.05, 0.05)
         confidence = max(0.0, min(1.0, confidence))
         
         # Random timestamp within last 24 hours
-        hours_ago = random.randint(0, 24)
-        minutes_ago = random.randint(0, 59)
-        timestamp = datetime.utcnow() - timedelta(hours=hours_ago, minutes=minutes_ago)
+        minutes_ago = random.randint(0, 24) * 60 + random.randint(0, 59)
+        timestamp = datetime.utcnow() - _MINUTE * minutes_ago
         
         incident = ThreatIncident(
             id=f"inc-{uuid.uuid4().hex[:8]}",
@@ -160,19 +206,16 @@ class ThreatGenerator:
             source_ip=self._get_random_external_ip(),
             destination_ip=self._get_random_internal_ip(),
             source_port=random.randint(1024, 65535),
-            destination_port=random.choice([22, 80, 443, 3306, 5432, 8080]),
+            destination_port=random.choice(self.DESTINATION_PORTS),
             target_service=random.choice(self.SERVICES),
-            description=random.choice(self.ATTACK_DESCRIPTIONS[attack_type]),
-            mitre_techniques=random.sample(
-                self.MITRE_TECHNIQUES.get(attack_type, ["T1087"]),
-                k=min(2, len(self.MITRE_TECHNIQUES.get(attack_type, ["T1087"])))
-            ),
+            description=random.choice(self._descriptions[attack_type]),
+            mitre_techniques=random.sample(*self._techniques[attack_type]),
             threat_actor=threat_actor,
             confidence=confidence,
             status="open",
             metadata={
-                "detection_method": random.choice(["ML Model", "Signature", "Heuristic", "Behavioral"]),
-                "model_name": random.choice(["XGBoost", "CNN-LSTM", "Ensemble"]),
+                "detection_method": random.choice(self.DETECTION_METHODS),
+                "model_name": random.choice(self.MODEL_NAMES),
                 "packets_analyzed": random.randint(100, 10000),
                 "bytes_transferred": random.randint(1000, 1000000),
             }
@@ -180,6 +223,81 @@ class ThreatGenerator:
         
         return incident
     
+    def _choose(self, options, n: int) -> list:
+        """Draw n elements of options, reusing the option objects themselves
+        (rng.choice on strings would allocate a fresh str per row)"""
+        return [options[i] for i in self._rng.integers(0, len(options), size=n).tolist()]
+    
+    def _pick(self, options_per_row: List[tuple]) -> list:
+        """Uniformly pick one element from each row's options"""
+        sizes = np.fromiter((len(o) for o in options_per_row), dtype=np.int64, count=len(options_per_row))
+        picks = (self._rng.random(len(options_per_row)) * sizes).astype(np.int64).tolist()
+        return [options[i] for options, i in zip(options_per_row, picks)]
+    
     def generate_batch(self, count: int = 10) -> List[ThreatIncident]:
-        """Generate a batch of incidents"""
-        return [self.generate_incident() for _ in range(count)]
+        """Generate a batch of incidents.
+        
+        All random fields are drawn for the whole batch with NumPy; the Python
+        loop only assembles the models. Distributions match generate_incident.
+        """
+        n = count
+        rng = self._rng
+        self.incident_counter += n
+        
+        attack_codes = rng.integers(0, len(_ATTACK_TYPES), size=n)
+        # Weighted severity per attack type: first CDF bucket above a uniform draw
+        severity_codes = (rng.random((n, 1)) < self._severity_cdf[attack_codes]).argmax(axis=1)
+        
+        attributed = self._attributed[severity_codes].tolist()
+        actors = self._choose(self.THREAT_ACTORS, n)
+        
+        confidences = np.clip(
+            self._confidence_base[severity_codes] + rng.uniform(-0.05, 0.05, size=n), 0.0, 1.0
+        ).tolist()
+        
+        # Random timestamp within last 24 hours
+        minutes_ago = rng.integers(0, 25, size=n) * 60 + rng.integers(0, 60, size=n)
+        now = np.datetime64(datetime.utcnow(), 'us')
+        timestamps = (now - minutes_ago.astype('timedelta64[m]')).tolist()
+        
+        attack_types = [_ATTACK_TYPES[c] for c in attack_codes.tolist()]
+        severities = [_SEVERITIES[c] for c in severity_codes.tolist()]
+        source_ips = self._choose(self.EXTERNAL_IPS, n)
+        destination_ips = self._choose(self._INTERNAL_POOL, n)
+        source_ports = rng.integers(1024, 65536, size=n).tolist()
+        destination_ports = self._choose(self.DESTINATION_PORTS, n)
+        services = self._choose(self.SERVICES, n)
+        descriptions = self._pick([self._descriptions[a] for a in attack_types])
+        techniques = self._pick([self._technique_perms[a] for a in attack_types])
+        detection_methods = self._choose(self.DETECTION_METHODS, n)
+        model_names = self._choose(self.MODEL_NAMES, n)
+        packets = rng.integers(100, 10001, size=n).tolist()
+        transferred = rng.integers(1000, 1000001, size=n).tolist()
+        # One urandom read for the batch: 4 random bytes (8 hex chars) per id, as uuid4().hex[:8] gave
+        id_hex = os.urandom(4 * n).hex()
+        
+        return [
+            ThreatIncident(
+                id="inc-" + id_hex[8 * i:8 * i + 8],
+                timestamp=timestamps[i],
+                severity=severities[i],
+                attack_type=attack_types[i],
+                source_ip=source_ips[i],
+                destination_ip=destination_ips[i],
+                source_port=source_ports[i],
+                destination_port=destination_ports[i],
+                target_service=services[i],
+                description=descriptions[i],
+                mitre_techniques=list(techniques[i]),
+                threat_actor=actors[i] if attributed[i] else None,
+                confidence=confidences[i],
+                status="open",
+                metadata={
+                    "detection_method": detection_methods[i],
+                    "model_name": model_names[i],
+                    "packets_analyzed": packets[i],
+                    "bytes_transferred": transferred[i],
+                }
+            )
+            for i in range(n)
+        ]
@@ -1,10 +1,19 @@
-import json
+import asyncio
 import logging
 import os
-from typing import Dict, List
-from .models import Vulnerability
+import sys
+from typing import Dict, List, Set
+
+import orjson
+from .models import Vulnerability, validate_vulnerability
 from .sources.cisa import CisaKevIngestor
 from .sources.nvd import NvdIngestor
+from .sources.http import open_client
+
+try:
+    import ijson  # streaming parser: keeps one record in memory at a time
+except ImportError:
+    ijson = None
 
 logger = logging.getLogger(__name__)
 
@@ -14,9 +23,13 @@ class VulnDataManager:
     Acts as the single source of truth for vulnerability data.
     """
     DB_PATH = os.path.join(os.path.dirname(__file__), "..", "pentest", "data", "cve_db.json")
+    # Compact output by default; set VULN_DB_PRETTY=1 for an indented, human-readable file
+    PRETTY_JSON = os.getenv("VULN_DB_PRETTY", "").lower() in ("1", "true", "yes")
 
     def __init__(self):
         self.db: Dict[str, Vulnerability] = {}
+        # CPE sets for merged records; written back to affected_cpes on save
+        self._cpes: Dict[str, Set[str]] = {}
         self.ensure_db_dir()
 
     def ensure_db_dir(self):
@@ -26,12 +39,15 @@ class VulnDataManager:
         """Loads existing DB from disk."""
         if os.path.exists(self.DB_PATH):
             try:
-                with open(self.DB_PATH, 'r') as f:
-                    data = json.load(f)
+                with open(self.DB_PATH, 'rb') as f:
+                    if ijson is not None:
+                        data = ijson.items(f, 'item', use_float=True)
+                    else:
+                        data = orjson.loads(f.read())
                     # Deserialize
                     for item in data:
                         try:
-                            vuln = Vulnerability(**item)
+                            vuln = self._intern(validate_vulnerability(item))
                             self.db[vuln.id] = vuln
                         except Exception as e:
                             logger.error(f"Failed to load vuln from DB: {e}")
@@ -41,27 +57,31 @@ class VulnDataManager:
         else:
             logger.info("No local DB found. Starting fresh.")
 
+    @staticmethod
+    def _intern(vuln: Vulnerability) -> Vulnerability:
+        """Share CPE and tag strings across records; the parser allocates a fresh str for each."""
+        vuln.affected_cpes = [sys.intern(cpe) for cpe in vuln.affected_cpes]
+        vuln.tags = [sys.intern(tag) for tag in vuln.tags]
+        return vuln
+
     def save_db(self):
         """Persists DB to disk."""
+        self._materialize_cpes()
         try:
-            # Serialize
-            data = [v.dict(exclude_none=True) for v in self.db.values()]
-            # Custom JSON encoder for datetime might be needed, strictly pydantic .dict() handles it usually if using .json() but here we list
-            # Pydantic v1 vs v2. .model_dump(mode='json') in v2. using .dict() for compat or v1. 
-            # If datetime objects persist, json.dump will fail. Pydantic's .json() is safer but for a list...
-            
-            # Helper to convert datetimes
-            def json_serial(obj):
-                if hasattr(obj, 'isoformat'):
-                    return obj.isoformat()
-                raise TypeError ("Type not serializable")
-
-            with open(self.DB_PATH, 'w') as f:
-                json.dump(data, f, default=json_serial, indent=2)
+            # Serialize: orjson handles datetimes natively, so the plain dict form is enough
+            data = [v.to_dict(exclude_none=True) for v in self.db.values()]
+            with open(self.DB_PATH, 'wb') as f:
+                f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2 if self.PRETTY_JSON else None))
             logger.info(f"Saved {len(self.db)} vulnerabilities to {self.DB_PATH}")
         except Exception as e:
             logger.error(f"Failed to save DB: {e}")
 
+    def _materialize_cpes(self):
+        """Write merged CPE sets back onto their records."""
+        for vuln_id, cpes in self._cpes.items():
+            self.db[vuln_id].affected_cpes = list(cpes)
+        self._cpes.clear()
+
     def merge_vulns(self, new_vulns: List[Vulnerability]):
         """Merges new data into the DB, prioritizing critical signals."""
         for new_v in new_vulns:
@@ -79,8 +99,11 @@ class VulnDataManager:
                 if not existing.description and new_v.description:
                     existing.description = new_v.description
                 
-                # 3. Append CPEs (deduplicate)
-                existing.affected_cpes = list(set(existing.affected_cpes + new_v.affected_cpes))
+                # 3. Append CPEs (deduplicate in place; materialized on save)
+                cpes = self._cpes.get(new_v.id)
+                if cpes is None:
+                    cpes = self._cpes[new_v.id] = set(existing.affected_cpes)
+                cpes.update(new_v.affected_cpes)
                 
                 # 4. Update severity if new source has higher confidence? 
                 # NVD usually has the canonical CVSS. CISA has the "Real" severity.
@@ -93,19 +116,24 @@ class VulnDataManager:
     def sync_all(self):
         """Runs all ingestors and updates DB."""
         self.load_db()
+        cisa_vulns, nvd_vulns = asyncio.run(self._fetch_all())
         
         # 1. CISA KEV (High Priority, Fast)
-        cisa = CisaKevIngestor()
-        cisa_vulns = cisa.run()
         self.merge_vulns(cisa_vulns)
         
         # 2. NVD (Volume, Slow)
-        nvd = NvdIngestor()
-        nvd_vulns = nvd.run()
         self.merge_vulns(nvd_vulns)
         
         self.save_db()
 
+    async def _fetch_all(self):
+        """Downloads both feeds concurrently over one shared HTTP client."""
+        async with open_client() as client:
+            return await asyncio.gather(
+                CisaKevIngestor().run_async(client),
+                NvdIngestor().run_async(client),
+            )
+
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
     manager = VulnDataManager()
@@ -1,58 +1,78 @@
-from typing import List, Optional
+from dataclasses import asdict, dataclass, field
+from typing import Annotated, Any, Dict, List, Optional, Tuple
 from datetime import datetime
-from pydantic import BaseModel, Field
+from pydantic import Field, TypeAdapter, ValidationError
 
-class VulnerabilityReference(BaseModel):
+@dataclass(slots=True)
+class VulnerabilityReference:
     url: str
     source: str  # e.g., "MITRE", "NVD", "CISA"
-    tags: List[str] = Field(default_factory=list)
+    tags: List[str] = field(default_factory=list)
 
-class Vulnerability(BaseModel):
+@dataclass(slots=True)
+class Vulnerability:
     """
     Normalized Vulnerability Model for Aegis.
     Aggregates data from multiple sources (NVD, CISA, OSV).
+
+    A plain slotted dataclass: constructing it directly does no validation.
+    Feed and on-disk data goes through validate_vulnerabilities /
+    validate_vulnerability, which enforce the field types and constraints.
     """
-    id: str = Field(..., description="Primary ID (usually CVE ID)")
-    
+    id: str  # Primary ID (usually CVE ID)
+
     # Identifiers
     cve_id: Optional[str] = None
     osv_id: Optional[str] = None
-    
+
     # Core Risk Signals
-    severity_score: float = Field(0.0, ge=0.0, le=10.0, description="Computed Aegis Risk Score")
-    severity_level: str = Field("LOW", description="CRITICAL, HIGH, MEDIUM, LOW")
-    known_exploited: bool = Field(False, description="True if present in CISA KEV or other exploit feeds")
+    severity_score: Annotated[float, Field(ge=0.0, le=10.0)] = 0.0  # Computed Aegis Risk Score
+    severity_level: str = "LOW"  # CRITICAL, HIGH, MEDIUM, LOW
+    known_exploited: bool = False  # True if present in CISA KEV or other exploit feeds
     exploit_url: Optional[str] = None
-    
+
     # Descriptive Data
     description: str = ""
     title: Optional[str] = None
     published_date: Optional[datetime] = None
     last_modified: Optional[datetime] = None
-    
+
     # Official Metrics (NVD/MITRE)
     cvss_v3_score: Optional[float] = None
     cvss_v3_vector: Optional[str] = None
     epss_score: Optional[float] = None # Exploit Prediction Scoring System
-    
+
     # Matching
-    affected_cpes: List[str] = Field(default_factory=list, description="List of CPE strings this vuln affects")
-    affected_packages: List[str] = Field(default_factory=list, description="Package names (e.g. for OSV)")
-    
+    affected_cpes: List[str] = field(default_factory=list)  # List of CPE strings this vuln affects
+    affected_packages: List[str] = field(default_factory=list)  # Package names (e.g. for OSV)
+
     # Metadata
-    references: List[VulnerabilityReference] = Field(default_factory=list)
-    tags: List[str] = Field(default_factory=list) # e.g. ["RANSOMWARE", "KEV", "REMOTE"]
-
-    class Config:
-        json_schema_extra = {
-            "example": {
-                "id": "CVE-2021-44228",
-                "cve_id": "CVE-2021-44228",
-                "severity_score": 10.0,
-                "severity_level": "CRITICAL",
-                "known_exploited": True,
-                "title": "Log4Shell",
-                "description": "Remote code execution in Log4j...",
-                "tags": ["KEV", "RCE"]
-            }
-        }
+    references: List[VulnerabilityReference] = field(default_factory=list)
+    tags: List[str] = field(default_factory=list) # e.g. ["RANSOMWARE", "KEV", "REMOTE"]
+
+    def to_dict(self, exclude_none: bool = False) -> Dict[str, Any]:
+        """Plain-dict form for serialization boundaries."""
+        data = asdict(self)
+        if exclude_none:
+            data = {k: v for k, v in data.items() if v is not None}
+        return data
+
+
+# Built once: validating a whole batch reuses one validator instead of a model call per record
+_VULN_LIST = TypeAdapter(List[Vulnerability])
+validate_vulnerability = TypeAdapter(Vulnerability).validate_python
+
+
+def validate_vulnerabilities(records: List[Dict[str, Any]]) -> Tuple[List[Vulnerability], Dict[int, str]]:
+    """
+    Validates shaped records into Vulnerability models in one batch.
+    Returns the valid models and, for each rejected record index, its error message.
+    """
+    try:
+        return _VULN_LIST.validate_python(records), {}
+    except ValidationError as e:
+        rejected: Dict[int, str] = {}
+        for err in e.errors():
+            rejected.setdefault(err["loc"][0], f"{'.'.join(map(str, err['loc'][1:]))}: {err['msg']}")
+        valid = [r for i, r in enumerate(records) if i not in rejected]
+        return _VULN_LIST.validate_python(valid), rejected
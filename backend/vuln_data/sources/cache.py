@@ -0,0 +1,114 @@
+import hashlib
+import logging
+import os
+import tempfile
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import orjson
+
+from ..models import Vulnerability, validate_vulnerabilities
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "pentest", "data", "feed_cache")
+
+
+@dataclass
+class CachedFeed:
+    """Normalized result of a feed download, with the validators needed to revalidate it."""
+    etag: Optional[str]
+    last_modified: Optional[str]
+    items: List[Vulnerability]
+
+
+def _cache_path(key: str) -> str:
+    # hashlib, not hash(): str hashes are salted per process
+    return os.path.join(CACHE_DIR, hashlib.sha256(key.encode()).hexdigest() + ".json")
+
+
+def _read(key: str) -> Any:
+    """Returns the JSON document cached under key, or None if absent or unreadable."""
+    try:
+        with open(_cache_path(key), "rb") as f:
+            return orjson.loads(f.read())
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning("Ignoring unreadable feed cache for %s: %s", key, e)
+        return None
+
+
+def _write(key: str, obj: Any):
+    """Stores obj as JSON atomically (temp file + rename), so readers never see a partial file."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            # orjson serializes the Vulnerability dataclasses and their datetimes natively
+            f.write(orjson.dumps(obj))
+        os.replace(tmp_path, _cache_path(key))
+    except Exception as e:
+        logger.warning("Failed to write feed cache for %s: %s", key, e)
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+def load(key: str) -> Optional[CachedFeed]:
+    """
+    Returns the cached feed for key, or None if absent or unreadable.
+    Items are revalidated into Vulnerability models; a cache with any invalid
+    item is ignored as a whole, since a 304 would otherwise serve it partially.
+    """
+    data = _read(key)
+    if not isinstance(data, dict):
+        return None
+    items, rejected = validate_vulnerabilities(data.get("items") or [])
+    if rejected:
+        logger.warning("Ignoring feed cache for %s: %d invalid items", key, len(rejected))
+        return None
+    return CachedFeed(data.get("etag"), data.get("last_modified"), items)
+
+
+def save(key: str, etag: Optional[str], last_modified: Optional[str], items: List[Vulnerability]):
+    """Stores a feed result together with its validators."""
+    if not (etag or last_modified):
+        return  # nothing to revalidate against next time
+    _write(key, CachedFeed(etag, last_modified, items))
+
+
+def load_index(key: str) -> Dict[str, Tuple[str, Vulnerability]]:
+    """
+    Returns the cached {id: (upstream lastModified, normalized vuln)} index for key.
+    Entries that no longer validate are dropped, so they are normalized again.
+    """
+    data = _read(key)
+    if not isinstance(data, dict):
+        return {}
+    entries = list(data.items())
+    vulns, rejected = validate_vulnerabilities([vuln for _, (_, vuln) in entries])
+    kept = (entry for i, entry in enumerate(entries) if i not in rejected)
+    return {vuln_id: (last_modified, vuln) for (vuln_id, (last_modified, _)), vuln in zip(kept, vulns)}
+
+
+def save_index(key: str, index: Dict[str, Tuple[str, Vulnerability]]):
+    """Stores the normalized index for key, replacing the previous one."""
+    _write(key, index)
+
+
+def conditional_headers(cached: Optional[CachedFeed]) -> Dict[str, str]:
+    """If-None-Match / If-Modified-Since headers for revalidating a cached feed."""
+    headers = {}
+    if cached is not None:
+        if cached.etag:
+            headers["If-None-Match"] = cached.etag
+        if cached.last_modified:
+            headers["If-Modified-Since"] = cached.last_modified
+    return headers
+
+
+def validators(response_headers: Any) -> Dict[str, Optional[str]]:
+    """Picks the cache validators out of a response's headers."""
+    return {"etag": response_headers.get("ETag"), "last_modified": response_headers.get("Last-Modified")}
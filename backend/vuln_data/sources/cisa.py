@@ -1,11 +1,19 @@
-import requests
+import asyncio
 import logging
-from typing import List, Dict, Any
+import sys
+from typing import AsyncIterator, List, Dict, Any, Optional
 from datetime import datetime
-from ..models import Vulnerability, VulnerabilityReference
+
+import httpx
+from ..models import Vulnerability, validate_vulnerabilities
+from . import cache as feed_cache
+from .http import iter_json_items, open_client
 
 logger = logging.getLogger(__name__)
 
+_SPACE_TO_UNDERSCORE = str.maketrans(" ", "_")
+_PSEUDO_CPE = "cpe:2.3:a:{}:{}:*:*:*:*:*:*:*:*"
+
 class CisaKevIngestor:
     """
     Ingests data from CISA's Known Exploited Vulnerabilities Catalog.
@@ -14,73 +22,105 @@ class CisaKevIngestor:
     URL = "https://www.cisa.gov/sites/default/files/feeds/known_exploited_vulnerabilities.json"
     SOURCE_NAME = "CISA KEV"
 
-    def fetch(self) -> List[Dict[str, Any]]:
-        """Fetches the raw JSON catalog."""
+    async def fetch(self, client: httpx.AsyncClient, headers: Optional[Dict[str, str]] = None,
+                    meta: Optional[Dict[str, Any]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streams the raw catalog entries as they are downloaded.
+        The response status and cache validators are recorded into `meta` if given;
+        a 304 (catalog unchanged) yields nothing.
+        """
         try:
-            logger.info(f"Fetching CISA KEV from {self.URL}...")
-            response = requests.get(self.URL, timeout=30)
-            response.raise_for_status()
-            data = response.json()
-            return data.get("vulnerabilities", [])
+            logger.info("Fetching CISA KEV from %s...", self.URL)
+            async with client.stream("GET", self.URL, headers=headers, timeout=30) as response:
+                if meta is not None:
+                    meta["status"] = response.status_code
+                    meta.update(feed_cache.validators(response.headers))
+                if response.status_code == 304:
+                    return
+                response.raise_for_status()
+                async for item in iter_json_items(response, "vulnerabilities"):
+                    yield item
         except Exception as e:
-            logger.error(f"Failed to fetch CISA KEV: {e}")
-            return []
+            logger.error("Failed to fetch CISA KEV: %s", e)
+            if meta is not None:
+                meta.pop("status", None)  # a partial download must not be cached
 
-    def normalize(self, raw_vuln: Dict[str, Any]) -> Vulnerability:
-        """Converts a CISA KEV entry into an Aegis Vulnerability model."""
+    def normalize(self, raw_vuln: Dict[str, Any]) -> Dict[str, Any]:
+        """Shapes a CISA KEV entry into Vulnerability fields (validated in batch by run)."""
         cve_id = raw_vuln.get("cveID")
         
         # CISA data is minimal but critical
         # It guarantees "known_exploited = True"
         
-        vuln = Vulnerability(
-            id=cve_id,
-            cve_id=cve_id,
-            title=raw_vuln.get("vulnerabilityName"),
-            description=raw_vuln.get("shortDescription"),
-            known_exploited=True,
-            severity_level="CRITICAL", # KEV implies critical attention req, though CVSS might vary
-            severity_score=9.0, # Base proxy score if CVSS missing (will be merged later)
-            tags=["KEV", "EXPLOITED"]
-        )
+        vuln = {
+            "id": cve_id,
+            "cve_id": cve_id,
+            "title": raw_vuln.get("vulnerabilityName"),
+            "description": raw_vuln.get("shortDescription"),
+            "known_exploited": True,
+            "severity_level": "CRITICAL", # KEV implies critical attention req, though CVSS might vary
+            "severity_score": 9.0, # Base proxy score if CVSS missing (will be merged later)
+            "tags": ["KEV", "EXPLOITED"],
+        }
 
         # Attempt to create a pseudo-CPE for matching
         # CISA gives "vendorProject" and "product"
-        vendor = raw_vuln.get("vendorProject", "").lower().replace(" ", "_")
-        product = raw_vuln.get("product", "").lower().replace(" ", "_")
+        vendor = raw_vuln.get("vendorProject")
+        product = raw_vuln.get("product")
         
         if vendor and product:
             # Construct cpe:2.3:a:vendor:product:*:...
-            pseudo_cpe = f"cpe:2.3:a:{vendor}:{product}:*:*:*:*:*:*:*:*"
-            vuln.affected_cpes.append(pseudo_cpe)
+            vuln["affected_cpes"] = [sys.intern(_PSEUDO_CPE.format(
+                vendor.lower().translate(_SPACE_TO_UNDERSCORE),
+                product.lower().translate(_SPACE_TO_UNDERSCORE),
+            ))]
         
         # Parse dates
         if raw_vuln.get("dateAdded"):
             try:
-                vuln.published_date = datetime.strptime(raw_vuln["dateAdded"], "%Y-%m-%d")
+                # C-level ISO parse; dateAdded is always a zero-padded YYYY-MM-DD
+                vuln["published_date"] = datetime.fromisoformat(raw_vuln["dateAdded"])
             except ValueError:
                 pass
                 
         # References
         if raw_vuln.get("notes"):
-            vuln.references.append(VulnerabilityReference(
-                url=raw_vuln["notes"], # CISA often puts act URL here or text
-                source=self.SOURCE_NAME,
-                tags=["Notes"]
-            ))
+            vuln["references"] = [{
+                "url": raw_vuln["notes"], # CISA often puts act URL here or text
+                "source": self.SOURCE_NAME,
+                "tags": ["Notes"],
+            }]
             
         return vuln
 
     def run(self) -> List[Vulnerability]:
         """Main execution method."""
-        raw_items = self.fetch()
-        normalized_items = []
-        for item in raw_items:
+        return asyncio.run(self.run_async())
+
+    async def run_async(self, client: Optional[httpx.AsyncClient] = None) -> List[Vulnerability]:
+        """Runs the ingest, on the given client if one is shared with other ingestors."""
+        if client is None:
+            async with open_client() as client:
+                return await self.run_async(client)
+
+        cached = feed_cache.load(self.URL)
+        meta: Dict[str, Any] = {}
+        records = []
+        async for item in self.fetch(client, feed_cache.conditional_headers(cached), meta):
             try:
-                normalized = self.normalize(item)
-                normalized_items.append(normalized)
+                records.append(self.normalize(item))
             except Exception as e:
-                logger.warning(f"Failed to normalize CISA item {item.get('cveID')}: {e}")
+                logger.warning("Failed to normalize CISA item %s: %s", item.get('cveID'), e)
+
+        if meta.get("status") == 304 and cached is not None:
+            logger.info("CISA KEV unchanged; reusing %d cached vulnerabilities.", len(cached.items))
+            return cached.items
+
+        normalized_items, rejected = validate_vulnerabilities(records)
+        for index, error in rejected.items():
+            logger.warning("Failed to normalize CISA item %s: %s", records[index].get('id'), error)
+        if meta.get("status") == 200:
+            feed_cache.save(self.URL, meta["etag"], meta["last_modified"], normalized_items)
         
-        logger.info(f"Ingested {len(normalized_items)} vulnerabilities from CISA KEV.")
+        logger.info("Ingested %d vulnerabilities from CISA KEV.", len(normalized_items))
         return normalized_items
@@ -0,0 +1,101 @@
+import asyncio
+from typing import Any, AsyncIterator, Dict, Optional
+
+import httpx
+import orjson
+
+try:
+    import ijson  # streaming parser: keeps one record in memory at a time
+except ImportError:
+    ijson = None
+
+# NVD serves everything from one host; keep enough connections open to overlap page downloads
+MAX_CONNECTIONS_PER_HOST = 19
+DEFAULT_TIMEOUT = 60.0
+# NVD answers 503 (and 429) when throttling; back off 1s, 2s, 4s... before giving up
+RETRY_STATUSES = frozenset({429, 503})
+MAX_RETRIES = 5
+BACKOFF_FACTOR = 1.0
+
+
+class _RetryTransport(httpx.AsyncBaseTransport):
+    """Retries throttled responses with exponential backoff; connection retries are left to the pool."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        for attempt in range(MAX_RETRIES):
+            response = await self._transport.handle_async_request(request)
+            if response.status_code not in RETRY_STATUSES:
+                return response
+            await response.aclose()
+            await asyncio.sleep(BACKOFF_FACTOR * 2 ** attempt)
+        return await self._transport.handle_async_request(request)
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+def open_client() -> httpx.AsyncClient:
+    """
+    Creates the async HTTP client shared by the ingestors of one sync run:
+    one connection pool (TLS sessions reused across pages and feeds),
+    compressed transfers and backoff on throttling.
+    """
+    transport = httpx.AsyncHTTPTransport(
+        limits=httpx.Limits(max_connections=MAX_CONNECTIONS_PER_HOST),
+        retries=2,  # connect failures only
+    )
+    return httpx.AsyncClient(
+        transport=_RetryTransport(transport),
+        headers={"Accept-Encoding": "gzip, deflate"},
+        timeout=DEFAULT_TIMEOUT,
+    )
+
+
+class _ResponseReader:
+    """Async file-like view of a streamed response body, as ijson's async API expects."""
+
+    def __init__(self, response: httpx.Response):
+        self._chunks = response.aiter_bytes()
+
+    async def read(self, size: int = -1) -> bytes:
+        if size == 0:
+            # ijson probes with read(0) to detect bytes vs str; don't consume a chunk for it
+            return b""
+        # An empty read means EOF to ijson, so skip any empty chunks the transport yields
+        async for chunk in self._chunks:
+            if chunk:
+                return chunk
+        return b""
+
+
+async def iter_json_items(response: httpx.Response, container: str,
+                          header: Optional[Dict[str, Any]] = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Yields the objects of a top-level JSON array (response[container]) as they
+    arrive, without building the whole document. Top-level scalar fields seen
+    along the way (e.g. totalResults) are collected into `header` if given.
+    """
+    if ijson is None:
+        data = orjson.loads(await response.aread())
+        if header is not None:
+            header.update((k, v) for k, v in data.items() if k != container)
+        for item in data.get(container, []):
+            yield item
+        return
+
+    item_prefix = f"{container}.item"
+    builder = None
+    async for prefix, event, value in ijson.parse_async(_ResponseReader(response), use_float=True):
+        if builder is not None:
+            builder.event(event, value)
+            if prefix == item_prefix and event == "end_map":
+                yield builder.value
+                builder = None
+        elif prefix == item_prefix and event == "start_map":
+            builder = ijson.ObjectBuilder()
+            builder.event(event, value)
+        elif header is not None and "." not in prefix and event in ("string", "number", "boolean"):
+            header[prefix] = value
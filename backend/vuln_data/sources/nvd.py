@@ -1,9 +1,13 @@
-import requests
+import asyncio
 import logging
-import time
-from typing import List, Dict, Any, Optional
+import sys
+from typing import Callable, List, Dict, Any, Optional
 from datetime import datetime, timedelta
-from ..models import Vulnerability, VulnerabilityReference
+
+import httpx
+from ..models import Vulnerability, validate_vulnerabilities
+from . import cache as feed_cache
+from .http import iter_json_items, open_client
 
 logger = logging.getLogger(__name__)
 
@@ -13,16 +17,17 @@ class NvdIngestor:
     """
     BASE_URL = "https://services.nvd.nist.gov/rest/json/cves/2.0"
     SOURCE_NAME = "NIST NVD"
+    RESULTS_PER_PAGE = 2000  # API maximum
     
     def __init__(self, api_key: Optional[str] = None):
         self.api_key = api_key
         # Delay to respect rate limits (without Key: 5 req/30s -> 6s delay. With Key: 50 req/30s -> 0.6s)
         self.delay = 0.6 if api_key else 6.0 
 
-    def fetch_changes(self, last_mod_start_date: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    def _query_params(self, last_mod_start_date: Optional[datetime] = None) -> Dict[str, Any]:
         """
-        Fetches CVEs modified since the given date.
-        If None, fetches recent (last 7 days) to limit volume for this demo.
+        Builds the query for CVEs modified since the given date.
+        If None, fetches recent (last 30 days) to limit volume for this demo.
         """
         params = {}
         if last_mod_start_date:
@@ -34,27 +39,60 @@ class NvdIngestor:
             end = datetime.utcnow()
             params["pubStartDate"] = start.isoformat()
             params["pubEndDate"] = end.isoformat()
+        params["resultsPerPage"] = self.RESULTS_PER_PAGE
+        return params
+
+    async def _page(self, client: httpx.AsyncClient, params: Dict[str, Any], headers: Dict[str, str],
+                    start_index: int, wait: float, sink: Callable[[Dict[str, Any]], None],
+                    header: Optional[Dict[str, Any]] = None):
+        """Streams one page of results into sink, starting after `wait` seconds."""
+        await asyncio.sleep(wait)
+        async with client.stream("GET", self.BASE_URL, params={**params, "startIndex": start_index},
+                                 headers=headers) as response:
+            response.raise_for_status()
+            async for item in iter_json_items(response, "vulnerabilities", header):
+                sink(item)
 
+    async def fetch_changes_async(self, client: httpx.AsyncClient, sink: Callable[[Dict[str, Any]], None],
+                                  last_mod_start_date: Optional[datetime] = None) -> bool:
+        """
+        Streams every CVE modified since the given date into sink, one raw item at a time.
+        The first page reports totalResults; the remaining pages are requested
+        concurrently, their start times staggered by the rate-limit delay.
+        Returns False if any page failed.
+        """
+        params = self._query_params(last_mod_start_date)
         headers = {}
         if self.api_key:
             headers["apiKey"] = self.api_key
 
         try:
-            logger.info(f"Fetching NVD data with params: {params}")
-            # Note: In a real prod system, we would handle pagination (startIndex).
-            # For this MVP, we fetch the first page (2000 items max default).
-            params["resultsPerPage"] = 500 
-            
-            response = requests.get(self.BASE_URL, params=params, headers=headers, timeout=60)
-            response.raise_for_status()
-            data = response.json()
-            return data.get("vulnerabilities", [])
+            logger.info("Fetching NVD data with params: %s", params)
+            header: Dict[str, Any] = {}
+            await self._page(client, params, headers, 0, 0.0, sink, header)
+            total = int(header.get("totalResults", 0))
+
+            starts = range(self.RESULTS_PER_PAGE, total, self.RESULTS_PER_PAGE)
+            pages = [
+                asyncio.create_task(self._page(client, params, headers, start, self.delay * n, sink))
+                for n, start in enumerate(starts, 1)
+            ]
+            try:
+                await asyncio.gather(*pages)
+            except BaseException:
+                # gather leaves the other pages running; stop them so nothing
+                # reaches sink after the failure has been reported
+                for page in pages:
+                    page.cancel()
+                await asyncio.gather(*pages, return_exceptions=True)
+                raise
+            return True
         except Exception as e:
-            logger.error(f"Failed to fetch NVD data: {e}")
-            return []
+            logger.error("Failed to fetch NVD data: %s", e)
+            return False
 
-    def normalize(self, raw_item: Dict[str, Any]) -> Vulnerability:
-        """Converts NVD JSON item to Aegis Vulnerability."""
+    def normalize(self, raw_item: Dict[str, Any]) -> Dict[str, Any]:
+        """Shapes an NVD JSON item into Vulnerability fields (validated in batch by run)."""
         cve = raw_item.get("cve", {})
         cve_id = cve.get("id")
         
@@ -72,40 +110,73 @@ class NvdIngestor:
             vector = primary.get("vectorString")
             severity = primary.get("baseSeverity", "LOW")
 
-        vuln = Vulnerability(
-            id=cve_id,
-            cve_id=cve_id,
-            severity_score=score,
-            severity_level=severity,
-            cvss_v3_score=score,
-            cvss_v3_vector=vector,
-            description=cve.get("descriptions", [{}])[0].get("value", ""),
-            published_date=datetime.fromisoformat(cve.get("published", "").replace("Z", "+00:00")) if cve.get("published") else None,
-            last_modified=datetime.fromisoformat(cve.get("lastModified", "").replace("Z", "+00:00")) if cve.get("lastModified") else None,
-        )
+        # Timestamps stay ISO strings: pydantic parses them (including a trailing Z) during validation
+        vuln = {
+            "id": cve_id,
+            "cve_id": cve_id,
+            "severity_score": score,
+            "severity_level": severity,
+            "cvss_v3_score": score,
+            "cvss_v3_vector": vector,
+            "description": cve.get("descriptions", [{}])[0].get("value", ""),
+            "published_date": cve.get("published") or None,
+            "last_modified": cve.get("lastModified") or None,
+        }
         
         # Configurations / CPEs
-        # Extract CPEs for matching
+        # Extract CPEs for matching; interned, since many CVEs share the same criteria
         if "configurations" in cve:
-            for config in cve["configurations"]:
-                for node in config.get("nodes", []):
-                    for match in node.get("cpeMatch", []):
-                        if match.get("vulnerable"):
-                            vuln.affected_cpes.append(match.get("criteria"))
+            vuln["affected_cpes"] = [
+                sys.intern(match["criteria"])
+                for config in cve["configurations"]
+                for node in config.get("nodes", ())
+                for match in node.get("cpeMatch", ())
+                if match.get("vulnerable") and match.get("criteria")
+            ]
         
         return vuln
 
     def run(self) -> List[Vulnerability]:
         """Runs the sync."""
-        raw_items = self.fetch_changes()
-        normalized_items = []
-        for item in raw_items:
+        return asyncio.run(self.run_async())
+
+    async def run_async(self, client: Optional[httpx.AsyncClient] = None) -> List[Vulnerability]:
+        """Runs the sync, on the given client if one is shared with other ingestors."""
+        if client is None:
+            async with open_client() as client:
+                return await self.run_async(client)
+
+        # Only CVEs whose lastModified changed since the previous sync are normalized again
+        previous = feed_cache.load_index(self.BASE_URL)
+        index: Dict[str, Any] = {}
+        records = []
+
+        def collect(item: Dict[str, Any]):
+            # NVD API structure: { "cve": ... } wrapped in list items
+            cve = item.get("cve", {})
+            hit = previous.get(cve.get("id"))
+            if hit is not None and hit[0] and hit[0] == cve.get("lastModified"):
+                index[cve["id"]] = hit
+                return
             try:
-                # NVD API structure: { "cve": ... } wrapped in list items
-                normalized = self.normalize(item)
-                normalized_items.append(normalized)
+                records.append(self.normalize(item))
             except Exception as e:
-                logger.debug(f"Failed to normalize NVD item: {e}")
+                logger.debug("Failed to normalize NVD item: %s", e)
+
+        complete = await self.fetch_changes_async(client, collect)
+
+        validated, rejected = validate_vulnerabilities(records)
+        for error in rejected.values():
+            logger.debug("Failed to normalize NVD item: %s", error)
+        logger.debug("Normalized %d changed NVD items, reused %d cached.", len(validated), len(index))
+
+        accepted = (r for i, r in enumerate(records) if i not in rejected)
+        for record, vuln in zip(accepted, validated):
+            index[vuln.id] = (record["last_modified"], vuln)
+        # CVEs absent from this fetch drop out of the index, so it always mirrors the latest result
+        if complete:
+            feed_cache.save_index(self.BASE_URL, index)
+        normalized_items = [vuln for _, vuln in index.values()]
                 
-        logger.info(f"Ingested {len(normalized_items)} vulnerabilities from NVD.")
+        logger.info("Ingested %d vulnerabilities from NVD.", len(normalized_items))
         return normalized_items
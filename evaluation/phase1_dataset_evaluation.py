@@ -14,30 +14,151 @@ Expected Output: Comprehensive metrics report
 """
 
 import json
+import os
+import queue
+import threading
 import time
 from pathlib import Path
-from typing import Dict, Tuple
+from typing import Dict, List, Optional, Tuple
 import numpy as np
-import pandas as pd
 import joblib
+import pyarrow.parquet as pq
 import matplotlib.pyplot as plt
 import seaborn as sns
 from sklearn.metrics import (
     confusion_matrix, classification_report, roc_auc_score,
-    precision_recall_curve, roc_curve, auc, average_precision_score
+    precision_recall_curve, roc_curve, average_precision_score
 )
+from contextlib import contextmanager
 from datetime import datetime
 
+# Below this many rows, dispatching chunks to workers costs more than it saves
+PARALLEL_MIN_ROWS = 500_000
+# Curves are plotted from at most this many points; the AUC values use all of them
+MAX_CURVE_POINTS = 1000
+# Decoded feature batches the reader may run ahead of inference
+READ_AHEAD_BATCHES = 2
+
+_END_OF_BATCHES = object()
+
+
+def fast_binary_auc(y_true: np.ndarray, y_scores: np.ndarray) -> float:
+    """
+    ROC-AUC via the Mann-Whitney U statistic: one sort, no curve arrays.
+    Tied scores share their average rank, matching sklearn's roc_auc_score.
+    """
+    y_true = np.asarray(y_true, dtype=bool)
+    n = y_true.size
+    n_pos = int(y_true.sum())
+    n_neg = n - n_pos
+    if n_pos == 0 or n_neg == 0:
+        return float('nan')
+    
+    order = np.argsort(y_scores, kind='mergesort')
+    sorted_scores = y_scores[order]
+    # Boundaries of runs of equal scores; each run gets the mean of its 1-based ranks
+    bounds = np.flatnonzero(np.r_[True, sorted_scores[1:] != sorted_scores[:-1], True])
+    run_ranks = (bounds[:-1] + bounds[1:] + 1) / 2.0
+    ranks = np.empty(n, dtype=np.float64)
+    ranks[order] = np.repeat(run_ranks, np.diff(bounds))
+    
+    return float((ranks[y_true].sum() - n_pos * (n_pos + 1) / 2.0) / (n_pos * n_neg))
+
+
+def _thin(*curves: np.ndarray) -> Tuple[np.ndarray, ...]:
+    """Evenly subsample curve arrays down to MAX_CURVE_POINTS for plotting"""
+    n = len(curves[0])
+    if n <= MAX_CURVE_POINTS:
+        return curves
+    idx = np.linspace(0, n - 1, MAX_CURVE_POINTS).astype(np.int64)
+    return tuple(c[idx] for c in curves)
+
+
+def _model_feature_names(model) -> Optional[List[str]]:
+    """Feature order the model was trained on, if it recorded one"""
+    if hasattr(model, 'get_booster'):
+        names = model.get_booster().feature_names
+    else:
+        names = getattr(model, 'feature_names_in_', None)
+    return list(names) if names is not None else None
+
+
+@contextmanager
+def _capped_model_threads(model, n_threads: Optional[int]):
+    """
+    Limits the model's own thread pool (n_jobs / XGBoost nthread) while several
+    predict_proba calls run concurrently, restoring it afterwards. None leaves it as is.
+    """
+    params = model.get_params() if hasattr(model, 'get_params') else {}
+    if n_threads is None or 'n_jobs' not in params:
+        yield
+        return
+    
+    # set_params(n_jobs=None) does not reset an XGBoost booster's nthread, so restore it explicitly
+    booster = model.get_booster() if hasattr(model, 'get_booster') else None
+    booster_threads = (json.loads(booster.save_config())['learner']['generic_param']['nthread']
+                       if booster is not None else None)
+    model.set_params(n_jobs=n_threads)
+    try:
+        yield
+    finally:
+        model.set_params(n_jobs=params['n_jobs'])
+        if booster is not None:
+            booster.set_param('nthread', booster_threads)
+
+
+def _read_batches(path: Path, columns: list, batch_size: int, out: queue.Queue):
+    """
+    Reader stage: decodes the parquet feature columns batch by batch into
+    C-contiguous float32 matrices (what XGBoost predicts from without a
+    further conversion copy). Ends with a sentinel, or with the exception
+    that stopped it.
+    """
+    try:
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size, columns=columns):
+            X = np.empty((batch.num_rows, len(columns)), dtype=np.float32)
+            for j, name in enumerate(columns):
+                X[:, j] = batch.column(name).to_numpy(zero_copy_only=False)
+            out.put(X)
+    except BaseException as e:
+        out.put(e)
+        return
+    out.put(_END_OF_BATCHES)
+
+
+def _drain(batches: queue.Queue):
+    """Yields the reader's batches until its sentinel, re-raising reader errors here"""
+    while True:
+        item = batches.get()
+        if item is _END_OF_BATCHES:
+            return
+        if isinstance(item, BaseException):
+            raise item
+        yield item
+
+
+def _predict_chunk(model, X: np.ndarray, attack_idx: Optional[int]) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Predicted class indices and attack-class scores (binary only) for one chunk"""
+    proba = model.predict_proba(X)
+    scores = proba[:, attack_idx] if attack_idx is not None else None
+    return proba.argmax(axis=1), scores
+
+
 class Phase1DatasetEvaluator:
     """Classic ML evaluation on test dataset"""
     
-    def __init__(self, model_path: str, test_data_path: str, output_dir: str = "evaluation/results/phase1"):
+    def __init__(self, model_path: str, test_data_path: str, output_dir: str = "evaluation/results/phase1",
+                 batch_size: int = 200_000, n_jobs: int = -1):
         """
         Args:
             model_path: Path to trained model (artifacts/Syn/xgb_baseline.joblib)
             test_data_path: Path to test dataset (datasets/processed/Syn/test.parquet)
             output_dir: Where to save evaluation results
+            batch_size: Rows per predict_proba call (bounds peak inference memory)
+            n_jobs: Parallel inference workers (-1 = all cores)
         """
+        self.batch_size = batch_size
+        self.n_jobs = n_jobs
         self.model_path = Path(model_path)
         self.test_data_path = Path(test_data_path)
         self.output_dir = Path(output_dir)
@@ -52,13 +173,22 @@ class Phase1DatasetEvaluator:
         
         # Load test data
         print(f"📊 Loading test dataset from {self.test_data_path}")
-        df_test = pd.read_parquet(self.test_data_path)
-        self.X_test = df_test.drop('label', axis=1)
-        self.y_test = df_test['label']
-        
-        print(f"✅ Loaded {len(self.X_test):,} test samples")
+        # Only the labels are loaded up front; features are streamed in batches by
+        # _predict, by name and in the model's training order (the float32 matrix
+        # handed to predict_proba carries no names for the model to check)
+        columns = pq.read_schema(self.test_data_path).names
+        self.feature_names = _model_feature_names(self.model) or [c for c in columns if c != 'label']
+        missing = [c for c in self.feature_names if c not in columns]
+        if missing:
+            raise ValueError(f"Test dataset is missing model features: {missing}")
+        self.y_test = pq.read_table(self.test_data_path, columns=['label']).column('label').to_numpy()
+        # Class indices, as predicted; all metrics are computed on these
+        self.y_true = self.label_encoder.transform(self.y_test)
+        
+        counts = np.bincount(self.y_true, minlength=len(self.classes))
+        print(f"✅ Loaded {len(self.y_true):,} test samples")
         print(f"   Classes: {list(self.classes)}")
-        print(f"   Distribution: {dict(self.y_test.value_counts())}\n")
+        print(f"   Distribution: {dict(zip(self.classes.tolist(), counts.tolist()))}\n")
         
         # Results storage
         self.results = {}
@@ -73,26 +203,24 @@ class Phase1DatasetEvaluator:
         
         # Make predictions
         print("\n1️⃣ Making predictions on test set...")
-        y_pred = self.model.predict(self.X_test)
-        y_pred_proba = self.model.predict_proba(self.X_test)
-        
-        # Convert predictions to labels
-        y_pred_labels = [self.classes[int(p)] for p in y_pred]
+        y_pred, y_scores = self._predict()
         
         elapsed = time.time() - start_time
-        throughput = len(self.X_test) / elapsed
+        throughput = len(self.y_true) / elapsed
         
         print(f"   ✓ Predictions complete in {elapsed:.2f}s ({throughput:.0f} flows/sec)")
         
         # 1. Confusion Matrix
         print("\n2️⃣ Computing confusion matrix...")
-        cm = confusion_matrix(self.y_test, y_pred_labels, labels=self.classes)
+        labels = np.arange(len(self.classes))
+        cm = confusion_matrix(self.y_true, y_pred, labels=labels)
         self._plot_confusion_matrix(cm)
         
         # 2. Classification Report
         print("\n3️⃣ Computing classification metrics...")
         report = classification_report(
-            self.y_test, y_pred_labels,
+            self.y_true, y_pred,
+            labels=labels,
             target_names=self.classes,
             output_dict=True
         )
@@ -104,18 +232,18 @@ class Phase1DatasetEvaluator:
         
         # 4. ROC-AUC Analysis (binary classification)
         print("\n5️⃣ Computing ROC-AUC...")
-        roc_metrics = self._compute_roc_auc(y_pred_proba)
+        roc_metrics = self._compute_roc_auc(y_scores)
         
         # 5. Threshold Sweep
         print("\n6️⃣ Running threshold sweep analysis...")
-        threshold_results = self._threshold_sweep(y_pred_proba)
+        threshold_results = self._threshold_sweep(y_scores)
         
         # Store results
         self.results = {
             "timestamp": datetime.now().isoformat(),
             "model_path": str(self.model_path),
             "test_dataset": str(self.test_data_path),
-            "test_size": len(self.X_test),
+            "test_size": len(self.y_true),
             "evaluation_time_sec": elapsed,
             "throughput_flows_per_sec": throughput,
             "confusion_matrix": cm.tolist(),
@@ -135,6 +263,68 @@ class Phase1DatasetEvaluator:
         
         return self.results
     
+    def _attack_index(self) -> int:
+        """Column of the positive (attack) class in predict_proba output"""
+        return list(self.classes).index('DDoS_SYN') if 'DDoS_SYN' in self.classes else 1
+    
+    def _predict(self) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """
+        Streamed, chunked inference over the test set.
+        
+        Three overlapping stages joined by bounded queues: a reader thread
+        decodes parquet batches (at most READ_AHEAD_BATCHES ahead), the
+        predictors run predict_proba on them, and this thread copies each
+        result into the preallocated outputs. Throughput is set by the slowest
+        stage rather than their sum, and the full feature matrix is never held.
+        
+        Class predictions are the argmax of each probability block. For binary
+        models the attack-class score column is kept for the ROC and threshold
+        analyses.
+        
+        Predictors run on threads: XGBoost releases the GIL while predicting,
+        and threads share the model instead of pickling it to workers.
+        
+        Returns:
+            (y_pred class indices, y_scores or None for multi-class)
+        """
+        n = len(self.y_true)
+        binary = len(self.classes) == 2
+        attack_idx = self._attack_index() if binary else None
+        y_pred = np.empty(n, dtype=np.int64)
+        y_scores = np.empty(n, dtype=np.float32) if binary else None
+        
+        batches = queue.Queue(maxsize=READ_AHEAD_BATCHES)
+        reader = threading.Thread(
+            target=_read_batches,
+            args=(self.test_data_path, self.feature_names, self.batch_size, batches),
+            daemon=True,  # never outlives a failed evaluation blocked on a full queue
+        )
+        reader.start()
+        
+        n_jobs = self.n_jobs if n >= PARALLEL_MIN_ROWS else 1
+        workers = min(joblib.effective_n_jobs(n_jobs), -(-n // self.batch_size))
+        
+        # Each predictor thread gets an equal share of the cores for the model's own
+        # threads; otherwise every worker would fan out over all cores (cores x cores)
+        model_threads = max(1, (os.cpu_count() or 1) // workers) if workers > 1 else None
+        with _capped_model_threads(self.model, model_threads):
+            chunks = joblib.Parallel(n_jobs=n_jobs, prefer="threads", batch_size=1, return_as="generator")(
+                joblib.delayed(_predict_chunk)(self.model, X, attack_idx)
+                for X in _drain(batches)
+            )
+            
+            # Results arrive in file order; copy each into its slot as it lands
+            start = 0
+            for pred, scores in chunks:
+                stop = start + len(pred)
+                y_pred[start:stop] = pred
+                if binary:
+                    y_scores[start:stop] = scores
+                start = stop
+        reader.join()
+        
+        return y_pred, y_scores
+    
     def _plot_confusion_matrix(self, cm: np.ndarray):
         """Plot and save confusion matrix"""
         plt.figure(figsize=(10, 8))
@@ -195,7 +385,7 @@ class Phase1DatasetEvaluator:
         """Compute False Positive rate per 10,000 flows"""
         if len(self.classes) == 2:
             tn, fp, fn, tp = cm.ravel()
-            total_flows = len(self.X_test)
+            total_flows = len(self.y_true)
             fp_per_10k = (fp / total_flows) * 10000
             
             print(f"\n   False Positive Analysis:")
@@ -209,31 +399,34 @@ class Phase1DatasetEvaluator:
             # Multi-class: compute FP for attack class
             attack_idx = list(self.classes).index('DDoS_SYN') if 'DDoS_SYN' in self.classes else 0
             fp = cm[:, attack_idx].sum() - cm[attack_idx, attack_idx]
-            fp_per_10k = (fp / len(self.X_test)) * 10000
+            fp_per_10k = (fp / len(self.y_true)) * 10000
             print(f"   FP Rate per 10k flows: {fp_per_10k:.2f}")
             return fp_per_10k
     
-    def _compute_roc_auc(self, y_pred_proba: np.ndarray) -> Dict:
+    def _compute_roc_auc(self, y_scores: Optional[np.ndarray]) -> Dict:
         """Compute ROC-AUC and PR-AUC for binary classification"""
         if len(self.classes) != 2:
             print("   ⚠️  ROC-AUC only computed for binary classification")
             return {}
         
-        # Get probabilities for positive class (attack)
-        attack_idx = list(self.classes).index('DDoS_SYN') if 'DDoS_SYN' in self.classes else 1
-        y_scores = y_pred_proba[:, attack_idx]
+        # y_scores: probabilities for positive class (attack)
+        attack_idx = self._attack_index()
         
         # Convert labels to binary
-        y_true_binary = (self.y_test == self.classes[attack_idx]).astype(int)
+        y_true_binary = self.y_true == attack_idx
         
         # ROC-AUC
-        fpr, tpr, _ = roc_curve(y_true_binary, y_scores)
-        roc_auc = auc(fpr, tpr)
+        roc_auc = fast_binary_auc(y_true_binary, y_scores)
         
         # PR-AUC
-        precision, recall, _ = precision_recall_curve(y_true_binary, y_scores)
         pr_auc = average_precision_score(y_true_binary, y_scores)
         
+        # Curves are for the plot only
+        fpr, tpr, _ = roc_curve(y_true_binary, y_scores)
+        fpr, tpr = _thin(fpr, tpr)
+        precision, recall, _ = precision_recall_curve(y_true_binary, y_scores)
+        precision, recall = _thin(precision, recall)
+        
         print(f"   ROC-AUC Score: {roc_auc:.4f}")
         print(f"   PR-AUC Score:  {pr_auc:.4f}")
         
@@ -273,32 +466,39 @@ class Phase1DatasetEvaluator:
             "pr_auc": float(pr_auc)
         }
     
-    def _threshold_sweep(self, y_pred_proba: np.ndarray) -> Dict:
+    def _threshold_sweep(self, y_scores: Optional[np.ndarray]) -> Dict:
         """Evaluate model performance across different thresholds"""
         if len(self.classes) != 2:
             print("   ⚠️  Threshold sweep only for binary classification")
             return {}
         
-        attack_idx = list(self.classes).index('DDoS_SYN') if 'DDoS_SYN' in self.classes else 1
-        y_scores = y_pred_proba[:, attack_idx]
-        y_true_binary = (self.y_test == self.classes[attack_idx]).astype(int)
+        attack_idx = self._attack_index()
+        y_true_binary = self.y_true == attack_idx
         
         thresholds = [0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9]
         results = []
         
+        # One sort answers every threshold: the rows scoring below a cut are a
+        # prefix of the sorted order, so its positive count is a cumsum lookup
+        order = np.argsort(y_scores, kind='stable')
+        sorted_scores = y_scores[order]
+        pos_below = np.r_[0, np.cumsum(y_true_binary[order])]
+        n_pos = int(pos_below[-1])
+        n_neg = len(y_scores) - n_pos
+        # Compare in the scores' own dtype, as `y_scores >= threshold` does
+        cuts = np.searchsorted(sorted_scores, np.asarray(thresholds, dtype=y_scores.dtype), side='left')
+        
         print("\n   Threshold Sweep Results:")
         print("   " + "-"*70)
         print(f"   {'Threshold':<12} {'Recall':<12} {'Precision':<12} {'F1-Score':<12} {'FP Rate'}")
         print("   " + "-"*70)
         
-        for threshold in thresholds:
-            y_pred_thresh = (y_scores >= threshold).astype(int)
-            
-            # Compute metrics
-            tn = ((y_true_binary == 0) & (y_pred_thresh == 0)).sum()
-            fp = ((y_true_binary == 0) & (y_pred_thresh == 1)).sum()
-            fn = ((y_true_binary == 1) & (y_pred_thresh == 0)).sum()
-            tp = ((y_true_binary == 1) & (y_pred_thresh == 1)).sum()
+        for threshold, k in zip(thresholds, cuts):
+            # Compute metrics (the first k sorted rows are predicted benign)
+            fn = pos_below[k]
+            tn = k - fn
+            tp = n_pos - fn
+            fp = n_neg - tn
             
             recall = tp / (tp + fn) if (tp + fn) > 0 else 0
             precision = tp / (tp + fp) if (tp + fp) > 0 else 0
@@ -426,13 +626,17 @@ def main():
     parser.add_argument("--model", type=str, required=True, help="Path to trained model")
     parser.add_argument("--test-data", type=str, required=True, help="Path to test dataset")
     parser.add_argument("--output", type=str, default="evaluation/results/phase1", help="Output directory")
+    parser.add_argument("--batch-size", type=int, default=200_000, help="Rows per inference batch")
+    parser.add_argument("--n-jobs", type=int, default=-1, help="Parallel inference workers (-1 = all cores)")
     
     args = parser.parse_args()
     
     evaluator = Phase1DatasetEvaluator(
         model_path=args.model,
         test_data_path=args.test_data,
-        output_dir=args.output
+        output_dir=args.output,
+        batch_size=args.batch_size,
+        n_jobs=args.n_jobs
     )
     
     results = evaluator.evaluate_full_dataset()
@@ -68,5 +68,5 @@ echo "Press Ctrl+C to stop"
 echo "=========================================="
 echo ""
 
-# Start uvicorn server
-uvicorn backend.ids.serve.app:app --reload --host 0.0.0.0 --port 8000
+# Start uvicorn server (uvloop event loop + httptools HTTP parser, both from uvicorn[standard])
+uvicorn backend.ids.serve.app:app --reload --host 0.0.0.0 --port 8000 --loop uvloop --http httptools